@@ -10,9 +10,24 @@ FIX: Dezimalstellen-Auflösung korrekt einstellen
 import machine
 import time
 import onewire
+import ubinascii
 import ds18x20
 
 
+class SensorInfo:
+    """Identität eines Sensors - einmal pro ROM berechnet, danach nur gelesen"""
+    
+    __slots__ = ("rom", "family", "family_id", "type", "serial", "rom_str")
+    
+    def __init__(self, rom):
+        self.rom = bytes(rom)
+        self.family = rom[0]
+        self.family_id = "0x{:02X}".format(rom[0])
+        self.type = DS18x20.SENSOR_TYPES.get(rom[0], "Unknown({})".format(self.family_id))
+        self.serial = ubinascii.hexlify(self.rom).decode().upper()  # 16 Hex-Zeichen
+        self.rom_str = "{}-{}-{}".format(self.serial[:2], self.serial[2:14], self.serial[14:])  # FF-SSSSSSSSSSSS-CC
+
+
 class DS18x20:
     """DS18x20 Familie - Temperatur Sensoren - KORRIGIERT"""
     
@@ -30,6 +45,13 @@ class DS18x20:
         12: 4    # 0.0625°C → 4 Dezimal
     }
     
+    CMD_READ_POWER = 0xB4    # Read Power Supply: 0 = mind. ein Sensor parasitär versorgt
+    CMD_SEARCH_ROM = 0xF0    # Suche: alle Sensoren
+    CMD_ALARM_SEARCH = 0xEC  # Suche: nur Sensoren mit gesetztem Alarm-Flag (T >= TH oder T <= TL)
+    POLL_INTERVAL_MS = 5     # Abfrageintervall für "Wandlung fertig" (Read-Slot = 1)
+    RAW_POWER_ON = 0x0550    # 85 °C: Power-On-Wert, es lief keine Wandlung
+    RAW_DISCONNECTED = -2032 # -127 °C: übliche "Sensor getrennt"-Kennung
+    
     SENSOR_TYPES = {
         0x28: "DS18B20",
         0x10: "DS18S20",
@@ -37,43 +59,69 @@ class DS18x20:
     }
     
     def __init__(self, pin=2, resolution=12, name="DS18x20"):
+        self.pin_no = pin
         self.pin = machine.Pin(pin)
         self.ow = onewire.OneWire(self.pin)
         self.ds = ds18x20.DS18X20(self.ow)
         self.roms = []
+        self.infos = []       # SensorInfo je ROM (gleiche Reihenfolge wie self.roms)
         self.resolution = resolution if resolution in [9, 10, 11, 12] else 12
         self.conversion_time_ms = self.RESOLUTION_MAP[self.resolution][1]
+        self._conv_timeout_ms = self.conversion_time_ms
+        self._rom_res = {}    # abweichende Auflösung je ROM (adaptiver Modus)
+        self._rom_alarm = {}  # TH/TL je ROM, wird bei jedem Scratchpad-Write mitgeschrieben
         self.name = name
         self.initialized = False
         self.last_read = None
+        self.last_raw = False       # last_read in 1/16 °C (Festkomma) statt °C
+        self._conv_start_ms = None  # ticks_ms beim Start der laufenden Wandlung
+        self._conv_done = False
+        self.parasite = False       # parasitär versorgt -> kein Polling möglich
+        # Gemessene Wandlungszeiten (ms) für Latenz-Statistik
+        self.conv_count = 0
+        self.conv_timeouts = 0
+        self.conv_last_ms = None
+        self.conv_min_ms = None
+        self.conv_max_ms = None
+        self.conv_sum_ms = 0
+        # Scratchpad-Prüfung
+        self.retries = 2          # Wiederholungen bei CRC-/Lesefehler
+        self.crc_errors = 0
+        self.read_retries = 0
+        self.sentinels = 0        # verworfene 85 °C / -127 °C / Null-Scratchpads
     
-    def init(self):
-        """Scannt Bus und initialisiert Sensoren"""
+    def init(self, known=None):
+        """Scannt Bus und initialisiert Sensoren.
+        known: Eintrag aus der ROM-Tabelle (siehe table_entry()). Passt die
+        Auflösung, werden die bekannten Sensoren direkt adressiert - ohne
+        Suche; das Scratchpad wird nur gelesen und bei Abweichung geschrieben."""
         try:
-            self.roms = self.ds.scan()
+            if known and known.get("roms") and known.get("resolution") == self.resolution:
+                self._set_roms([bytearray(ubinascii.unhexlify(r)) for r in known["roms"]])
+                self.parasite = known.get("parasite", False)
+                print(f"✓ {self.name} aus ROM-Tabelle - {len(self.roms)} Sensor(e)")
+                # Scratchpad ist flüchtig: nach einem Power-Cycle gilt wieder der EEPROM-Wert
+                self._write_resolution(self.roms)
+                self.initialized = True
+                return True
+            
+            self._set_roms(self.ds.scan())
             
             if not self.roms:
                 print(f"✗ {self.name}: Keine Sensoren gefunden")
                 return False
             
             print(f"✓ {self.name} initialisiert - {len(self.roms)} Sensor(e) gefunden")
+            self._print_roms(self.infos)
             
-            for i, rom in enumerate(self.roms):
-                family_code = rom[0]
-                sensor_type = self.SENSOR_TYPES.get(family_code, f"Unknown(0x{family_code:02x})")
-                serial_hex = ''.join(f'{b:02x}' for b in rom)
-                print(f"  [{i}] {sensor_type} - Serial: {serial_hex} - Family ID: 0x{family_code:02x}")
+            self.parasite = not self._read_power_supply()
+            if self.parasite:
+                print("  Parasitäre Versorgung erkannt - feste Wandlungszeit")
             
             decimals = self.RESOLUTION_DECIMALS[self.resolution]
             print(f"  Auflösung: {self.resolution}-bit ({self.conversion_time_ms}ms, {decimals} Dezimalstellen)")
             
-            if self.resolution != 12:
-                scratch_data = self.RESOLUTION_MAP[self.resolution][0]
-                for rom in self.roms:
-                    try:
-                        self.ds.write_scratch(rom, scratch_data)
-                    except:
-                        pass
+            self._write_resolution(self.roms)
             
             self.initialized = True
             return True
@@ -81,59 +129,366 @@ class DS18x20:
             print(f"✗ {self.name} Init-Fehler: {e}")
             return False
     
-    def read(self):
-        """Liest alle Sensoren mit KORREKTER Dezimalstellen-Auflösung"""
+    def _set_roms(self, roms):
+        """ROM-Liste setzen und Identitäten (Typ, Serial, ROM-String) einmalig berechnen"""
+        known = {info.rom: info for info in self.infos}
+        self.roms = roms
+        self.infos = [known.get(bytes(rom)) or SensorInfo(rom) for rom in roms]
+    
+    def _print_roms(self, infos):
+        for i, info in enumerate(infos):
+            print(f"  [{i}] {info.type} - Serial: {info.serial} - Family ID: {info.family_id}")
+    
+    def _write_resolution(self, roms):
+        """Basis-Auflösung sicherstellen: Konfigurationsbyte aus dem Scratchpad
+        lesen (ein Read je ROM) und nur bei Abweichung schreiben. Das
+        Scratchpad ist flüchtig - nach einem Power-Cycle steht dort der
+        EEPROM-Wert (ab Werk 12 bit), nach einem Reset ohne Power-Cycle evtl.
+        noch eine adaptive Auflösung. Gibt die Anzahl geschriebener Sensoren zurück."""
+        config = self.RESOLUTION_MAP[self.resolution][0][2]
+        written = 0
+        for rom in roms:
+            self._rom_res.pop(bytes(rom), None)
+            if rom[0] == 0x10:
+                continue  # DS18S20: feste Auflösung, kein Konfigurationsbyte
+            try:
+                if self.ds.read_scratch(rom)[4] == config:
+                    continue
+            except Exception:
+                self.crc_errors += 1
+            try:
+                self._write_config(rom, self.resolution)
+                written += 1
+            except:
+                pass
+        if written:
+            print(f"  {self.name}: Auflösung {self.resolution}-bit in {written} Sensor(en) geschrieben")
+        return written
+    
+    def _write_config(self, rom, res):
+        th, tl = self._rom_alarm.get(bytes(rom), (0, 0))
+        config = self.RESOLUTION_MAP[res][0][2]
+        self.ds.write_scratch(rom, bytes([th & 0xFF, tl & 0xFF, config]))
+    
+    def rom_resolution(self, rom):
+        """Aktuell eingestellte Auflösung eines Sensors"""
+        return self._rom_res.get(bytes(rom), self.resolution)
+    
+    def set_rom_resolution(self, rom, res):
+        """Auflösung eines einzelnen Sensors ändern (nur Scratchpad, kein EEPROM).
+        DS18S20 (0x10) hat keine einstellbare Auflösung. True = geschrieben."""
+        if rom[0] == 0x10 or res not in self.RESOLUTION_MAP or res == self.rom_resolution(rom):
+            return False
+        try:
+            self._write_config(rom, res)
+        except Exception as e:
+            print(f"{self.name} Auflösung {res}-bit Fehler: {e}")
+            return False
+        if res == self.resolution:
+            self._rom_res.pop(bytes(rom), None)
+        else:
+            self._rom_res[bytes(rom)] = res
+        return True
+    
+    def timeout_ms(self):
+        """Wandlungszeit laut Tabelle für die langsamste eingestellte Auflösung am Bus"""
+        if not self._rom_res:
+            return self.conversion_time_ms
+        return max(self.RESOLUTION_MAP[self.rom_resolution(r)][1] for r in self.roms)
+    
+    def rescan(self):
+        """Hot-Plug: Bus neu absuchen. Bekannte Sensoren behalten ihre Reihenfolge,
+        nur neue Sensoren bekommen die Auflösung geschrieben.
+        Gibt True zurück, wenn sich die ROM-Liste geändert hat."""
+        try:
+            found = self.ds.scan()
+        except Exception as e:
+            print(f"{self.name} Rescan-Fehler: {e}")
+            return False
+        
+        found_set = set(bytes(r) for r in found)
+        old_set = set(bytes(r) for r in self.roms)
+        if found_set == old_set:
+            return False
+        
+        keep = [r for r in self.roms if bytes(r) in found_set]
+        added = [r for r in found if bytes(r) not in old_set]
+        print(f"{self.name} Rescan: +{len(added)} / -{len(self.roms) - len(keep)} Sensor(en)")
+        self._set_roms(keep + added)
+        self._print_roms(self.infos[len(keep):])
+        self._write_resolution(added)
+        self.parasite = bool(self.roms) and not self._read_power_supply()
+        self.initialized = bool(self.roms)
+        return True
+    
+    def table_entry(self):
+        """Eintrag für die persistente ROM-Tabelle (roms.json)"""
+        return {
+            "roms": [info.serial for info in self.infos],
+            "families": [info.family_id for info in self.infos],
+            "resolution": self.resolution,
+            "parasite": self.parasite,
+        }
+    
+    def _read_power_supply(self):
+        """READ POWER SUPPLY (SKIP ROM): True = alle Sensoren extern versorgt"""
+        try:
+            self.ow.reset()
+            self.ow.writebyte(self.ow.SKIP_ROM)
+            self.ow.writebyte(self.CMD_READ_POWER)
+            return bool(self.ow.readbit())
+        except:
+            return False
+    
+    def start_conversion(self):
+        """Startet die Wandlung aller Sensoren am Bus (SKIP ROM), ohne zu warten.
+        Gibt die maximale Wartezeit in ms zurück (0 = nichts gestartet)."""
         if not self.initialized or not self.roms:
-            return None
+            return 0
         
         try:
             self.ds.convert_temp()
-            time.sleep_ms(self.conversion_time_ms)
+            self._conv_start_ms = time.ticks_ms()
+            self._conv_done = False
+            self._conv_timeout_ms = self.timeout_ms()
+            return self._conv_timeout_ms
+        except Exception as e:
+            print(f"{self.name} Wandlungsfehler: {e}")
+            self._conv_start_ms = None
+            return 0
+    
+    def conversion_done(self):
+        """Nicht-blockierend: ist die laufende Wandlung fertig?
+        Extern versorgte Sensoren halten den Bus auf 0, bis die Wandlung fertig
+        ist (Read-Slot = 1). Die Tabellenzeit dient als Timeout bzw. als feste
+        Wartezeit bei parasitärer Versorgung."""
+        if self._conv_start_ms is None or self._conv_done:
+            return True
+        
+        elapsed = time.ticks_diff(time.ticks_ms(), self._conv_start_ms)
+        if elapsed >= self._conv_timeout_ms:
+            if not self.parasite:
+                self.conv_timeouts += 1
+            self._record_conversion(elapsed)
+            return True
+        
+        if not self.parasite:
+            try:
+                if self.ow.readbit():
+                    self._record_conversion(elapsed)
+                    return True
+            except:
+                pass
+        return False
+    
+    def wait_conversion(self):
+        """Blockiert, bis die laufende Wandlung fertig ist (Polling statt fester Wartezeit)"""
+        while not self.conversion_done():
+            time.sleep_ms(self.POLL_INTERVAL_MS)
+    
+    def _record_conversion(self, ms):
+        self._conv_done = True
+        self.conv_count += 1
+        self.conv_last_ms = ms
+        self.conv_sum_ms += ms
+        if self.conv_min_ms is None or ms < self.conv_min_ms:
+            self.conv_min_ms = ms
+        if self.conv_max_ms is None or ms > self.conv_max_ms:
+            self.conv_max_ms = ms
+    
+    def conversion_stats(self):
+        """Statistik der gemessenen Wandlungszeiten dieses Busses"""
+        return {
+            "sensor": self.name,
+            "parasite": self.parasite,
+            "timeout_ms": self._conv_timeout_ms,
+            "count": self.conv_count,
+            "timeouts": self.conv_timeouts,
+            "last_ms": self.conv_last_ms,
+            "min_ms": self.conv_min_ms,
+            "max_ms": self.conv_max_ms,
+            "avg_ms": (self.conv_sum_ms // self.conv_count) if self.conv_count else None,
+        }
+    
+    def collect(self, roms=None, raw=False):
+        """Liest die Scratchpads nach start_conversion() aus.
+        Wartet vorher noch auf das Ende der Wandlung, falls nötig.
+        roms: nur diese Sensoren lesen (Standard: alle am Bus).
+        raw: int in 1/16 °C statt float (Festkomma-Pfad, keine Float-Allokation)."""
+        if self._conv_start_ms is None:
+            return None
+        
+        try:
+            self.wait_conversion()
             
             temps = []
-            decimals = self.RESOLUTION_DECIMALS.get(self.resolution, 2)
             
-            for rom in self.roms:
-                temp = self.ds.read_temp(rom)
-                temps.append(round(temp, decimals))
+            for rom in (self.roms if roms is None else roms):
+                # Fehler eines Sensors (z.B. abgesteckt) betrifft nicht die anderen am Bus
+                try:
+                    val = self.read_raw(rom)
+                    if val is not None and not raw:
+                        # Dezimalstellen passend zur Auflösung dieses Sensors
+                        res = self.rom_resolution(rom)
+                        val = round(val / 16, self.RESOLUTION_DECIMALS.get(res, 2))
+                    temps.append(val)
+                except Exception as e:
+                    # roms enthält nur Sensoren dieses Busses - Serial aus dem Cache
+                    print(f"{self.name} Lesefehler {self.infos[self.roms.index(rom)].serial}: {e}")
+                    temps.append(None)
             
-            self.last_read = temps
+            if roms is None:
+                self.last_read = temps
+                self.last_raw = raw
             return temps
         except Exception as e:
             print(f"{self.name} Lesefehler: {e}")
             return None
+        finally:
+            self._conv_start_ms = None
+    
+    def read_raw(self, rom):
+        """Scratchpad -> int in 1/16 °C, auf die Auflösung des Sensors maskiert.
+        CRC-geprüft mit bis zu self.retries Wiederholungen; 85 °C (Power-On),
+        -127 °C und ein Null-Scratchpad (Bus-Kurzschluss) ergeben None."""
+        buf = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.read_retries += 1
+            try:
+                buf = self.ds.read_scratch(rom)  # wirft bei CRC-Fehler
+                break
+            except Exception:
+                self.crc_errors += 1
+                buf = None
+        if buf is None:
+            return None
+        
+        if not any(buf):
+            self.sentinels += 1
+            return None
+        
+        if rom[0] == 0x10:
+            # DS18S20: 0.5 °C + COUNT_REMAIN/COUNT_PER_C (wie ds18x20.read_temp)
+            if buf[0] == 0xAA and buf[1] == 0x00:
+                self.sentinels += 1
+                return None
+            t = buf[0] >> 1
+            if buf[1]:
+                t -= 128
+            return t * 16 - 4 + ((buf[7] - buf[6]) * 16) // buf[7]
+        
+        t = buf[1] << 8 | buf[0]
+        if t & 0x8000:
+            t -= 0x10000
+        if t == self.RAW_POWER_ON or t == self.RAW_DISCONNECTED:
+            self.sentinels += 1
+            return None
+        return t & ~((1 << (12 - self.rom_resolution(rom))) - 1)
+    
+    def read_stats(self):
+        """Zähler der Scratchpad-Prüfung"""
+        return {
+            "sensor": self.name,
+            "crc_errors": self.crc_errors,
+            "retries": self.read_retries,
+            "sentinels": self.sentinels,
+        }
+    
+    def write_alarm(self, rom, th, tl):
+        """Schreibt TH/TL (ganze °C, int8) zusammen mit der Auflösung ins Scratchpad"""
+        th = max(-55, min(125, th))
+        tl = max(-55, min(125, tl))
+        self._rom_alarm[bytes(rom)] = (th, tl)
+        self._write_config(rom, self.rom_resolution(rom))
+    
+    def alarm_search(self):
+        """ALARM SEARCH (0xEC): ROMs aller Sensoren, deren letzte Wandlung
+        außerhalb TH/TL lag. Kostet eine Suche statt N Scratchpad-Reads."""
+        return self._search(self.CMD_ALARM_SEARCH)
+    
+    def _search(self, cmd):
+        """1-Wire-Binärbaumsuche mit frei wählbarem Suchbefehl
+        (Ablauf wie onewire.OneWire.scan(), das nur 0xF0 kennt)"""
+        devices = []
+        diff = 65
+        rom = None
+        for _ in range(0xff):
+            rom, diff = self._search_rom(cmd, rom, diff)
+            if rom:
+                devices.append(rom)
+            if diff == 0:
+                break
+        return devices
+    
+    def _search_rom(self, cmd, l_rom, diff):
+        ow = self.ow
+        if not ow.reset():
+            return None, 0
+        ow.writebyte(cmd)
+        if not l_rom:
+            l_rom = bytearray(8)
+        rom = bytearray(8)
+        next_diff = 0
+        i = 64
+        for byte in range(8):
+            r_b = 0
+            for bit in range(8):
+                b = ow.readbit()
+                if ow.readbit():
+                    if b:  # kein (Alarm-)Sensor antwortet oder Busfehler
+                        return None, 0
+                else:
+                    if not b:  # Kollision: Sensoren mit unterschiedlichem Bit
+                        if diff > i or ((l_rom[byte] & (1 << bit)) and diff != i):
+                            b = 1
+                            next_diff = i
+                ow.writebit(b)
+                if b:
+                    r_b |= 1 << bit
+                i -= 1
+            rom[byte] = r_b
+        return rom, next_diff
+    
+    def read(self):
+        """Liest alle Sensoren mit KORREKTER Dezimalstellen-Auflösung"""
+        if not self.start_conversion():
+            return None
+        
+        return self.collect()
     
     def get_data(self):
         """Gibt letzte Messung zurück"""
         return self.last_read
     
     def to_dict(self):
-        """Konvertiert zu Dictionary für Ausgabe"""
-        temps = self.read()
+        """Konvertiert die letzte Messung zu einem Dictionary für Ausgabe.
+        Kein Bus-Zugriff: Werte aus last_read, Identität aus self.infos."""
+        temps = self.last_read
+        if temps and self.last_raw:
+            temps = [None if t is None else t / 16 for t in temps]
         if temps:
             if len(temps) == 1:
-                rom = self.roms[0]
-                family_code = rom[0]
-                serial_hex = ''.join(f'{b:02x}' for b in rom)
+                info = self.infos[0]
                 return {
                     "sensor": self.name,
                     "type": "DS18x20",
                     "temperature_C": temps[0],
                     "resolution_bits": self.resolution,
                     "resolution_decimals": self.RESOLUTION_DECIMALS[self.resolution],
-                    "serial": serial_hex,
-                    "family_id": f"0x{family_code:02x}"
+                    "serial": info.serial,
+                    "rom": info.rom_str,
+                    "family_id": info.family_id
                 }
             else:
                 sensors = []
-                for i, rom in enumerate(self.roms):
-                    family_code = rom[0]
-                    serial_hex = ''.join(f'{b:02x}' for b in rom)
+                for i, info in enumerate(self.infos):
                     sensors.append({
                         "index": i,
-                        "temperature_C": temps[i],
-                        "serial": serial_hex,
-                        "family_id": f"0x{family_code:02x}"
+                        "temperature_C": temps[i] if i < len(temps) else None,
+                        "serial": info.serial,
+                        "rom": info.rom_str,
+                        "family_id": info.family_id
                     })
                 return {
                     "sensor": self.name,
@@ -0,0 +1,87 @@
+# assets.py - Statische Dashboard-Dateien: vorkomprimiert (gzip) im Flash + ETag
+#
+# Beim Start wird je Asset ein Inhalts-Hash gebildet (ETag). Passt er zum in
+# assets.json gespeicherten Stand, wird die vorhandene .gz-Datei benutzt,
+# sonst einmalig neu komprimiert (nur beim ersten Boot bzw. nach einem Update).
+# Ausgeliefert wird direkt aus der Datei in festen Blöcken; ohne gzip-Support
+# (Gerät ohne deflate-Kompression oder Client ohne Accept-Encoding: gzip)
+# geht der Klartext raus.
+
+import os
+import json
+import hashlib
+import ubinascii
+
+ASSET_FILE = "assets.json"
+GZIP_WBITS = 10         # Fenster 1 KB: wenig RAM beim Komprimieren auf dem Gerät
+
+_assets = {}            # Pfad -> (etag, content_type, cache_control, gz_datei oder None, body_str)
+
+def _etag(body):
+    return ubinascii.hexlify(hashlib.sha256(body).digest()[:8]).decode()
+
+def _gzip(body, fname):
+    """body -> gzip-Datei; False, wenn die Firmware nicht komprimieren kann"""
+    try:
+        try:
+            import deflate      # MicroPython >= 1.21
+            with open(fname, "wb") as f:
+                with deflate.DeflateIO(f, deflate.GZIP, GZIP_WBITS) as d:
+                    d.write(body)
+        except ImportError:
+            import gzip         # Host (CPython)
+            with open(fname, "wb") as f:
+                f.write(gzip.compress(body))
+        return True
+    except Exception as e:
+        print("✗ Asset gzip {}: {}".format(fname, e))
+        return False
+
+def _exists(fname):
+    try:
+        os.stat(fname)
+        return True
+    except OSError:
+        return False
+
+def _load_index():
+    try:
+        with open(ASSET_FILE) as f:
+            return json.load(f)
+    except:
+        return {}
+
+def register(assets):
+    """assets: [(pfad, content_type, cache_control, body_str), ...]
+    Legt fehlende/veraltete .gz-Dateien an und merkt sich die ETags."""
+    index = _load_index()
+    changed = False
+    for path, ctype, cache, body in assets:
+        data = body.encode()
+        etag = _etag(data)
+        fname = (path.strip("/").replace("/", "_") or "index.html") + ".gz"
+        gz = fname
+        if index.get(fname) != etag or not _exists(fname):
+            if _gzip(data, fname):
+                index[fname] = etag
+                changed = True
+                print("✓ Asset {} komprimiert".format(fname))
+            else:
+                gz = None
+                if index.pop(fname, None):
+                    changed = True
+        data = None
+        _assets[path] = (etag, ctype, cache, gz, body)
+    if changed:
+        try:
+            with open(ASSET_FILE, "w") as f:
+                json.dump(index, f)
+        except Exception as e:
+            print("✗ Fehler beim Speichern von {}: {}".format(ASSET_FILE, e))
+
+def get(path):
+    """(etag, content_type, cache_control, gz_datei oder None, body_str) oder None"""
+    return _assets.get(path)
+
+def etag(path):
+    return _assets[path][0]
@@ -0,0 +1,31 @@
+# fixpoint.py - Festkomma-Helfer: Temperaturen als int in 1/16 °C (Rohformat des DS18B20)
+
+SCALE = 16  # 1 LSB = 0.0625 °C
+
+
+def to_raw(celsius):
+    """°C (float/int) -> int in 1/16 °C (einmalig, z.B. für Config-Werte)"""
+    if celsius is None:
+        return None
+    v = celsius * SCALE
+    return int(v + 0.5) if v >= 0 else -int(-v + 0.5)
+
+
+def from_raw(raw):
+    """int in 1/16 °C -> float °C (nur an den JSON/CSV-Rändern verwenden)"""
+    return None if raw is None else raw / SCALE
+
+
+def fmt_raw(raw, width=0):
+    """Formatiert 1/16 °C mit 3 Nachkommastellen ohne Float.
+    Rundet wie "{:.3f}" (bei exakt .5 auf gerade), z.B. 271 -> "16.938"."""
+    if raw is None:
+        return ""
+    neg = raw < 0
+    q, r = divmod(-raw * 125 if neg else raw * 125, 2)  # Tausendstel, r = halbes Tausendstel
+    if r and q & 1:
+        q += 1
+    s = "{}{}.{:03d}".format("-" if neg and q else "", q // 1000, q % 1000)
+    if width > len(s):
+        s = " " * (width - len(s)) + s
+    return s
@@ -0,0 +1,96 @@
+# history.py - Jüngste Messwerte als Ringpuffer im RAM
+#
+# Vorab angelegte array-Puffer (Zeit als uint32, Werte als int16 in 1/16 °C,
+# NULL_RAW = kein Wert), befüllt mit jedem Log-Eintrag (logger.add_entry_raw).
+# Die Log-Tabelle im Dashboard (/api/log) und der Trend in /api/temps lesen
+# nur von hier - ohne Dateizugriff und ohne Listen je Anfrage.
+
+import _thread
+from array import array
+
+SIZE = 120              # Einträge im RAM (config.json: history_size)
+NULL_RAW = -32768       # wie logger.NULL_RAW
+
+_lock = _thread.allocate_lock()
+_ts = array("I")
+_vals = array("h")      # je Eintrag 3 Werte hintereinander (A, B, C)
+_size = 0
+_head = 0               # nächster Schreibplatz
+_count = 0
+_added = 0              # Einträge seit Boot (für "neu seit ..." beim SSE-Stream)
+
+def configure(size=None):
+    """Legt die Puffer einmalig mit 'size' Einträgen an (leert sie)"""
+    global _ts, _vals, _size, _head, _count
+    with _lock:
+        _size = max(1, int(size or SIZE))
+        _ts = array("I", (0 for _ in range(_size)))
+        _vals = array("h", (NULL_RAW for _ in range(3 * _size)))
+        _head = _count = 0
+
+def add(epoch, r1, r2, r3):
+    """Neuer Eintrag (int in 1/16 °C, None = fehlt) - überschreibt den ältesten"""
+    global _head, _count, _added
+    if not _size:
+        return
+    with _lock:
+        _ts[_head] = epoch
+        i = 3 * _head
+        _vals[i] = NULL_RAW if r1 is None else r1
+        _vals[i + 1] = NULL_RAW if r2 is None else r2
+        _vals[i + 2] = NULL_RAW if r3 is None else r3
+        _head = (_head + 1) % _size
+        if _count < _size:
+            _count += 1
+        _added += 1
+
+def clear():
+    global _head, _count
+    with _lock:
+        _head = _count = 0
+
+def count():
+    return _count
+
+def added():
+    """Fortlaufender Zähler aller Einträge (wird von clear() nicht zurückgesetzt)"""
+    return _added
+
+def _slot(k):
+    """k-ter Eintrag von hinten (0 = jüngster) -> Pufferindex"""
+    return (_head - 1 - k) % _size
+
+def get(k):
+    """k-ter Eintrag von hinten (0 = jüngster) als (ts, r1, r2, r3), sonst None"""
+    with _lock:
+        if k >= _count:
+            return None
+        p = _slot(k)
+        i = 3 * p
+        return (_ts[p],
+                None if _vals[i] == NULL_RAW else _vals[i],
+                None if _vals[i + 1] == NULL_RAW else _vals[i + 1],
+                None if _vals[i + 2] == NULL_RAW else _vals[i + 2])
+
+def trend(sensor, n=10):
+    """Änderung von Sensor 0..2 über die letzten n Einträge in 1/16 °C
+    (jüngster minus ältester gültiger Wert), None wenn zu wenig Werte"""
+    with _lock:
+        first = last = None
+        seen = 0
+        for k in range(min(n, _count)):
+            v = _vals[3 * _slot(k) + sensor]
+            if v == NULL_RAW:
+                continue
+            if last is None:
+                last = v
+            first = v
+            seen += 1
+        return last - first if seen > 1 else None
+
+def nbytes():
+    """RAM der Puffer in Byte"""
+    return _size * (4 + 3 * 2)
+
+def stats():
+    return {"size": _size, "entries": _count, "bytes": nbytes()}
@@ -1,103 +1,886 @@
-# logger.py - CSV-Datenlogger (Version 1.0 - Robust)
+# logger.py - CSV-Datenlogger (Version 5.0 - komprimierte, geprüfte Blöcke im Ringpuffer)
+#
+# Die Messwerte liegen in einer vorab angelegten Ringpuffer-Datei (log.ring):
+#   Header (16 Byte, nur beim Anlegen geschrieben): Magic "TLR4", Anzahl Blöcke,
+#     Blockgröße
+#   danach Blöcke zu je BLOCK_SIZE Byte, jeder für sich dekodierbar:
+#     Block-Header (16 Byte): Sequenznummer, Basis-Zeit (uint32), Basis-Werte
+#       A/B/C (int16, 1/16 °C, NULL_RAW = kein Wert), Flags, CRC8
+#     danach je weiterem Eintrag Varints (zig-zag) + CRC8:
+#       Zeit: Delta-of-Delta zum vorigen Eintrag (regelmäßiges Intervall -> 0)
+#       je Sensor: (Delta zum letzten Wert) << 1, bzw. 1 für "kein Wert"
+#       CRC8 über den Eintrag, verkettet mit dem vorigen (Start: Header-CRC)
+#     Siegel in den letzten 3 Byte (Anzahl Einträge + CRC8), wenn der Block voll ist
+# Typisch 5 Byte je Eintrag (3 Sensoren) statt 10 Byte Record bzw. ~40 Byte CSV.
+# CSV wird erst beim Lesen erzeugt (csv_chunks / get_log_lines) - Format und
+# Header bleiben unverändert.
+#
+# Uhrensprünge: Ohne RTC startet die Uhr bei jedem Boot wieder bei 2000-01-01.
+# Springt die Zeit zurück, beginnt ein neuer Block mit Flag _F_JUMP. Innerhalb
+# eines Blocks und zwischen zwei Sprüngen ist die Zeit damit monoton; die
+# Zeitfenster-Suche arbeitet je Abschnitt binär (_segments / _scan).
+#
+# Stromausfallsicher: Es wird nur angehängt - ein neuer Block wird einmal
+# komplett (mit 0xFF aufgefüllt) geschrieben, danach kommen nur neue Einträge
+# bzw. das Siegel hinzu. Es gibt keinen Schreibzeiger in der Datei; beim Start
+# sucht _recover() über die Block-Header (O(Blöcke)) die höchste gültige
+# Sequenznummer und liest im offenen Block bis zum ersten Eintrag mit falscher
+# CRC. Ein abgerissener Schreibvorgang kostet so höchstens die letzten Einträge.
+# Eine zu kurze Datei wird mit 0xFF ergänzt; eine unlesbare Datei wird nie
+# überschrieben, sondern als log.ring.bad aufgehoben.
+#
+# Write-Behind: neue Einträge werden im RAM in den offenen Block kodiert und
+# erst nach FLUSH_RECORDS Einträgen bzw. FLUSH_INTERVAL_S Sekunden (oder wenn
+# der Block voll ist) geschrieben. Lesezugriffe nehmen den offenen Block direkt
+# aus dem RAM. Vor einem Reset flush() aufrufen, sonst gehen die gepufferten
+# Werte verloren.
 
 import time
 import os
+import struct
+import _thread
+import rrd
+import history
+from fixpoint import fmt_raw, to_raw
 
-LOGFILE = "log.csv"
-MAX_LINES = 500 
+LOGFILE = "log.csv"     # altes CSV-Log, wird beim ersten Start übernommen (-> log.csv.bak)
+RINGFILE = "log.ring"
+CAPACITY = 2000         # Flash-Budget in Einträgen à 10 Byte (config.json: log_capacity)
 HEADER_LINE = "Zeit,Sensor A,Sensor B,Sensor C\n" # ACHTUNG: Leerzeichen im Header!
 
-def _now_string():
+NULL_RAW = -32768       # Sentinel für None
+BLOCK_SIZE = 256
+_BLK_FMT = "<IIhhhBB"   # Sequenz, Basis-Zeit, Basis-Werte A/B/C, Flags, CRC8
+_BLK_HDR = 16
+_SEAL_POS = BLOCK_SIZE - 3  # Siegel: uint16 Anzahl + CRC8
+_CRC_SEED = 0x5A
+_F_JUMP = 0x01          # Block-Flag: Zeit springt zurück, neuer zeitlich geordneter Abschnitt
+
+_MAGIC = b"TLR4"
+_BUDGET_REC_SIZE = 10   # log_capacity zählt Einträge à 10 Byte (unkomprimiert)
+_HDR_FMT = "<4sIII"
+_HDR_SIZE = 16
+_TAIL_BLOCK = 512       # Blockgröße beim Rückwärtslesen von Textdateien
+
+FLUSH_RECORDS = 10      # spätestens nach so vielen Einträgen schreiben
+FLUSH_INTERVAL_S = 60   # ... bzw. nach so vielen Sekunden seit dem letzten Flush
+
+_lock = _thread.allocate_lock()
+_fh = None              # offene Ringpuffer-Datei (r+b)
+_nblk = 0               # Blöcke in der Datei
+_head = 0               # Index des offenen (jüngsten) Blocks
+_used = 0               # belegte Blöcke inkl. offenem Block
+_seq = 0                # Sequenznummer des offenen Blocks
+_entries = 0            # Einträge in allen belegten Blöcken
+_jumps = []             # Sequenznummern der Blöcke, die einen Zeitabschnitt beginnen
+
+# offener Block im RAM + Encoder-Zustand
+_blk = bytearray(BLOCK_SIZE)
+_blk_n = 0
+_blk_used = 0
+_blk_sealed = False
+_chain = 0              # CRC des letzten Eintrags
+_last_ts = 0
+_last_delta = 0
+_prev = [0, 0, 0]
+_flushed_used = 0       # bis hier steht der offene Block in der Datei
+_unflushed = 0
+_tmp = bytearray(32)    # Kodierpuffer für einen Eintrag
+_last_flush_ms = time.ticks_ms()
+
+# Zähler für /api/status
+_bytes_written = 0
+_flushes = 0
+_recovered = 0          # beim Start verworfene (abgerissene) Bytes
+
+def _time_string(epoch):
     """YYYY-MM-DD HH:MM:SS"""
     try:
-        ts = time.localtime()
+        ts = time.localtime(epoch)
         return "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}".format(
             ts[0], ts[1], ts[2], ts[3], ts[4], ts[5])
     except:
         return "1970-01-01 00:00:00"
 
-def _ensure_header():
-    """Stellt sicher, dass das Logfile existiert und einen Header hat."""
+def format_record(rec):
+    """(ts, r1, r2, r3) -> CSV-Zeile (ohne '\\n')"""
+    return "{},{},{},{}".format(_time_string(rec[0]), fmt_raw(rec[1]), fmt_raw(rec[2]), fmt_raw(rec[3]))
+
+def _parse_line(line):
+    """CSV-Zeile (altes Format) -> (ts, r1, r2, r3), None bei kaputter Zeile"""
     try:
-        if LOGFILE not in os.listdir() or os.stat(LOGFILE)[6] < 10:
-            with open(LOGFILE, "w") as f:
-                f.write(HEADER_LINE)
-    except Exception as e:
-        print("Logger Header Check Error:", e)
+        parts = line.split(",")
+        d, t = parts[0].split(" ")
+        y, mo, dd = [int(x) for x in d.split("-")]
+        h, mi, sec = [int(x) for x in t.split(":")]
+        epoch = int(time.mktime((y, mo, dd, h, mi, sec, 0, 0, -1)))
+        vals = [to_raw(float(v)) if v.strip() else None for v in (parts[1:] + ["", "", ""])[:3]]
+        return (epoch, vals[0], vals[1], vals[2])
+    except:
+        return None
 
-def add_entry(t1, t2, t3):
-    """Fügt einen Eintrag hinzu und trimmt das Log, falls es zu groß wird."""
-    _ensure_header() 
-    
-    ts = _now_string()
-    def _fmt(v):
-        # None wird zu leerem String, den das JS dann als '--' oder leeren Wert liest
-        return "" if v is None else "{:.3f}".format(v)
-    
-    line = "{},{},{},{}\n".format(ts, _fmt(t1), _fmt(t2), _fmt(t3))
-    
+# -------------------------------------------------------
+# Kodierung
+# -------------------------------------------------------
+
+def _make_crc_table():
+    # CRC8 Dallas/Maxim (wie der DS18B20), reflektiertes Polynom 0x8C
+    t = bytearray(256)
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = (c >> 1) ^ 0x8C if c & 1 else c >> 1
+        t[i] = c
+    return bytes(t)
+
+_CRC_TABLE = _make_crc_table()
+
+def _crc8(buf, start, end, crc):
+    for i in range(start, end):
+        crc = _CRC_TABLE[crc ^ buf[i]]
+    return crc
+
+def _zz(v):
+    """zig-zag: 0, -1, 1, -2 ... -> 0, 1, 2, 3 ..."""
+    return v << 1 if v >= 0 else ((-v) << 1) - 1
+
+def _unzz(u):
+    return -((u + 1) >> 1) if u & 1 else u >> 1
+
+def _put_varint(buf, pos, u):
+    while u >= 0x80:
+        buf[pos] = (u & 0x7F) | 0x80
+        u >>= 7
+        pos += 1
+    buf[pos] = u
+    return pos + 1
+
+def _get_varint(buf, pos):
+    u = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        u |= (b & 0x7F) << shift
+        if b < 0x80:
+            return u, pos
+        shift += 7
+
+def _encode(rec):
+    """Kodiert einen Eintrag relativ zum Encoder-Zustand nach _tmp
+    (inkl. verketteter CRC8), Rückgabe Länge"""
+    n = _put_varint(_tmp, 0, _zz(rec[0] - _last_ts - _last_delta))
+    for s in range(3):
+        r = rec[1 + s]
+        n = _put_varint(_tmp, n, 1 if r is None else _zz(r - _prev[s]) << 1)
+    _tmp[n] = _crc8(_tmp, 0, n, _chain)
+    return n + 1
+
+def _entries_from(buf, pos, end, ts, base, chain, limit=-1):
+    """Dekodiert Einträge ab pos bis end (bzw. 'limit' Stück). Die Schleife
+    endet beim ersten Eintrag mit falscher CRC (Kette ab chain) oder
+    abgerissenem Varint. Rückgabe (Einträge, Ende der gültigen Daten, CRC-Kette)."""
+    out = []
+    prev = [0 if v is None else v for v in base]
+    delta = 0
+    while pos < end and limit != 0:
+        try:
+            p = pos
+            u, p = _get_varint(buf, p)
+            d = delta + _unzz(u)
+            vals = [None, None, None]
+            for s in range(3):
+                u, p = _get_varint(buf, p)
+                if not u & 1:
+                    vals[s] = prev[s] + _unzz(u >> 1)
+            if p >= end or _crc8(buf, pos, p, chain) != buf[p]:
+                break
+            chain = buf[p]
+            p += 1
+        except IndexError:
+            break
+        delta = d
+        ts += d
+        for s in range(3):
+            if vals[s] is not None:
+                prev[s] = vals[s]
+        out.append((ts, vals[0], vals[1], vals[2]))
+        pos = p
+        limit -= 1
+    return out, pos, chain
+
+def _decode(buf):
+    """Block -> (Einträge, Ende der gültigen Daten, CRC-Kette, versiegelt, Header-CRC).
+    Ungültiger Block-Header -> keine Einträge."""
+    seq, ts, a, b, c, _, crc = struct.unpack_from(_BLK_FMT, buf, 0)
+    if seq == 0xFFFFFFFF or _crc8(buf, 0, _BLK_HDR - 1, _CRC_SEED) != crc:
+        return [], 0, 0, False, None
+    base = (None if a == NULL_RAW else a, None if b == NULL_RAW else b, None if c == NULL_RAW else c)
+    n, seal = struct.unpack_from("<HB", buf, _SEAL_POS)
+    sealed = _crc8(buf, _SEAL_POS, _SEAL_POS + 2, crc) == seal
+    recs, pos, chain = _entries_from(buf, _BLK_HDR, _SEAL_POS, ts, base, crc, n - 1 if sealed else -1)
+    return [(ts,) + base] + recs, pos, chain, sealed, crc
+
+def decode_block(buf):
+    """Streaming-Decoder für einen Block: Bytes -> [(ts, r1, r2, r3), ...]
+    (1/16 °C, None = kein Wert). Braucht nur den Block selbst; endet beim
+    ersten beschädigten Eintrag."""
+    return _decode(buf)[0]
+
+# -------------------------------------------------------
+# Ringpuffer-Datei
+# -------------------------------------------------------
+
+def _blocks_for(capacity):
+    """Anzahl Blöcke für das Flash-Budget von capacity Einträgen à 10 Byte"""
+    return max(2, (capacity * _BUDGET_REC_SIZE + BLOCK_SIZE - 1) // BLOCK_SIZE)
+
+def _phys(j):
+    """Logischer Block j (0 = ältester) -> Blockindex in der Datei"""
+    return (_head - _used + 1 + j) % _nblk
+
+def _read_block(p):
+    """Block p aus der Datei; ein abgeschnittenes Dateiende zählt als leer (0xFF)"""
+    _fh.seek(_HDR_SIZE + p * BLOCK_SIZE)
+    data = _fh.read(BLOCK_SIZE)
+    if len(data) < BLOCK_SIZE:
+        data += b"\xff" * (BLOCK_SIZE - len(data))
+    return data
+
+def _block(j):
+    """Bytes des logischen Blocks j; der offene Block kommt aus dem RAM"""
+    p = _phys(j)
+    if p == _head:
+        return _blk
+    return _read_block(p)
+
+def _block_ts(j):
+    """Basis-Zeit des logischen Blocks j (ein kurzer Read)"""
+    p = _phys(j)
+    if p == _head:
+        return struct.unpack_from("<I", _blk, 4)[0]
+    _fh.seek(_HDR_SIZE + p * BLOCK_SIZE + 4)
+    return struct.unpack("<I", _fh.read(4))[0]
+
+def _block_n(p, hdr_crc=None):
+    """Einträge im Block p: aus dem Siegel (3 Byte), sonst durch Dekodieren.
+    Ein abgeschnittenes Siegel gilt als "nicht versiegelt"."""
+    if hdr_crc is not None:
+        _fh.seek(_HDR_SIZE + p * BLOCK_SIZE + _SEAL_POS)
+        s = _fh.read(3)
+        if len(s) == 3 and _crc8(s, 0, 2, hdr_crc) == s[2]:
+            return struct.unpack_from("<H", s, 0)[0]
+    return len(decode_block(_read_block(p)))
+
+def _segments():
+    """Zeitlich geordnete Abschnitte des Logs als [(erster, letzter Block), ...]
+    (logische Blöcke, in Log-Reihenfolge)"""
+    first = _seq - _used + 1
+    starts = [0]
+    for sq in _jumps:
+        if sq > first:
+            starts.append(sq - first)
+    starts.append(_used)
+    return [(starts[i], starts[i + 1] - 1) for i in range(len(starts) - 1)]
+
+def _first_block(t, lo=0, hi=None):
+    """Letzter logischer Block in [lo, hi] mit Basis-Zeit <= t (binäre Suche
+    über die Block-Header, O(log Blöcke) Reads). Der Bereich muss zeitlich
+    geordnet sein, also innerhalb eines Abschnitts aus _segments() liegen."""
+    if hi is None:
+        hi = _used - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _block_ts(mid) <= t:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _scan(t_from=None, t_to=None):
+    """Liefert die Einträge im Zeitfenster in Log-Reihenfolge, Block für Block
+    dekodiert (Lock muss gehalten werden). Jeder zeitlich geordnete Abschnitt
+    wird für sich per binärer Suche angesprungen - O(Abschnitte * log Blöcke)
+    Header-Reads plus die Blöcke des Fensters."""
+    for lo, hi in _segments():
+        j = lo
+        if t_from is not None:
+            j = _first_block(t_from, lo, hi)
+        if t_to is not None and _block_ts(j) > t_to:
+            continue
+        while j <= hi:
+            for rec in decode_block(_block(j)):
+                if t_from is not None and rec[0] < t_from:
+                    continue
+                if t_to is not None and rec[0] > t_to:
+                    j = hi
+                    break
+                yield rec
+            j += 1
+
+def _span():
+    """(früheste, späteste) Zeit im Log über alle Abschnitte - je Abschnitt
+    ein Header-Read und ein dekodierter Block"""
+    t_min = t_max = None
+    for lo, hi in _segments():
+        if hi == _used - 1:
+            b = _last_ts
+        else:
+            recs = decode_block(_block(hi))
+            if not recs:
+                continue        # unlesbarer Block (eigener, leerer Abschnitt)
+            b = recs[-1][0]
+        a = _block_ts(lo)
+        if t_min is None or a < t_min:
+            t_min = a
+        if t_max is None or b > t_max:
+            t_max = b
+    return t_min, t_max
+
+def _start_block(rec, flags=0):
+    """Neuer offener Block im RAM: Header + 0xFF-Füllung, rec als Basis"""
+    global _blk_n, _blk_used, _blk_sealed, _chain, _last_ts, _last_delta, _flushed_used
+    for i in range(BLOCK_SIZE):
+        _blk[i] = 0xFF
+    struct.pack_into(_BLK_FMT, _blk, 0, _seq, rec[0],
+                     NULL_RAW if rec[1] is None else rec[1],
+                     NULL_RAW if rec[2] is None else rec[2],
+                     NULL_RAW if rec[3] is None else rec[3], flags, 0)
+    _chain = _crc8(_blk, 0, _BLK_HDR - 1, _CRC_SEED)
+    _blk[_BLK_HDR - 1] = _chain
+    _blk_n, _blk_used, _blk_sealed = 1, _BLK_HDR, False
+    _last_ts, _last_delta = rec[0], 0
+    for s in range(3):
+        _prev[s] = 0 if rec[1 + s] is None else rec[1 + s]
+    _flushed_used = 0
+
+def _add(rec):
+    """Kodiert einen Eintrag in den offenen Block; ist er voll (oder springt
+    die Zeit zurück), wird er versiegelt und geschrieben und der nächste
+    (älteste) Block übernommen"""
+    global _blk_n, _blk_used, _chain, _last_ts, _last_delta, _entries, _used, _head, _seq, _unflushed
+    jump = _blk_n > 0 and rec[0] < _last_ts
+    if _blk_n and not _blk_sealed:
+        k = 0 if jump else _encode(rec)
+        if k and _blk_used + k <= _SEAL_POS and _blk_n < 0xFFFF:
+            _blk[_blk_used:_blk_used + k] = _tmp[:k]
+            _blk_used += k
+            _blk_n += 1
+            _chain = _tmp[k - 1]
+            _last_delta = rec[0] - _last_ts
+            _last_ts = rec[0]
+            for s in range(3):
+                if rec[1 + s] is not None:
+                    _prev[s] = rec[1 + s]
+            _entries += 1
+            _unflushed += 1
+            return
+        _flush(seal=True)
+    if _used:
+        _head = (_head + 1) % _nblk
+        if _used == _nblk:
+            _entries -= _block_n(_head)   # ältester Block wird überschrieben
+        else:
+            _used += 1
+        _seq += 1
+        while _jumps and _jumps[0] <= _seq - _used:
+            _jumps.pop(0)               # Abschnittsbeginn liegt nicht mehr im Log
+    else:
+        _used = 1
+    if jump:
+        _jumps.append(_seq)
+    _start_block(rec, _F_JUMP if jump else 0)
+    _entries += 1
+    _unflushed += 1
+
+def _flush(seal=False):
+    """Hängt die neuen Bytes des offenen Blocks an (ein neuer Block wird
+    einmal komplett geschrieben), mit seal=True zusätzlich das Siegel
+    (Lock muss gehalten werden)"""
+    global _flushed_used, _blk_sealed, _unflushed, _last_flush_ms, _bytes_written, _flushes
+    _last_flush_ms = time.ticks_ms()
+    if seal and not _blk_sealed and _blk_n:
+        struct.pack_into("<H", _blk, _SEAL_POS, _blk_n)
+        _blk[_SEAL_POS + 2] = _crc8(_blk, _SEAL_POS, _SEAL_POS + 2, _blk[_BLK_HDR - 1])
+        _blk_sealed = True
+    else:
+        seal = False
+    if not _blk_n or (_flushed_used == _blk_used and not seal):
+        return
+    off = _HDR_SIZE + _head * BLOCK_SIZE
+    mv = memoryview(_blk)
+    written = 0
+    if not _flushed_used:
+        _fh.seek(off)
+        _fh.write(mv)
+        written += BLOCK_SIZE
+    else:
+        if _blk_used > _flushed_used:
+            _fh.seek(off + _flushed_used)
+            _fh.write(mv[_flushed_used:_blk_used])
+            written += _blk_used - _flushed_used
+        if seal:
+            _fh.seek(off + _SEAL_POS)
+            _fh.write(mv[_SEAL_POS:])
+            written += 3
+    _flushed_used = _blk_used
+    try:
+        _fh.flush()
+    except:
+        pass
+    _unflushed = 0
+    _bytes_written += written
+    _flushes += 1
+
+def _recover():
+    """Baut den Zustand aus den Block-Headern auf (O(Blöcke) kurze Reads):
+    jüngster Block = höchste gültige Sequenznummer, davor absteigende
+    Sequenzen an ihrer erwarteten Position. Unlesbare Blöcke dazwischen
+    zählen als leer, statt die älteren Blöcke zu verwerfen. Im offenen Block
+    zählt nur, was die CRC-Kette bestätigt; ein abgerissener Rest wird beim
+    nächsten Eintrag überschrieben. Zeitabschnitte kommen aus den Flags."""
+    global _head, _used, _seq, _entries, _blk_n, _blk_used, _blk_sealed, _chain
+    global _last_ts, _last_delta, _flushed_used, _unflushed, _recovered
+    seqs = []
+    crcs = []
+    flags = bytearray(_nblk)
+    for p in range(_nblk):
+        _fh.seek(_HDR_SIZE + p * BLOCK_SIZE)
+        h = _fh.read(_BLK_HDR)
+        ok = False
+        if len(h) == _BLK_HDR:   # Datei kann nach einem Ausfall zu kurz sein
+            v = struct.unpack_from(_BLK_FMT, h, 0)
+            ok = v[0] != 0xFFFFFFFF and _crc8(h, 0, _BLK_HDR - 1, _CRC_SEED) == v[6]
+        seqs.append(v[0] if ok else None)
+        crcs.append(v[6] if ok else None)
+        if ok:
+            flags[p] = v[5]
+    _head, _used, _seq = 0, 0, 0
+    _entries = _blk_n = _blk_used = _flushed_used = _unflushed = 0
+    _blk_sealed = False
+    _jumps[:] = []
+    for p in range(_nblk):
+        if seqs[p] is not None and (not _used or seqs[p] > _seq):
+            _head, _seq, _used = p, seqs[p], 1
+    if not _used:
+        return
+    k = 1
+    while k < _nblk:
+        sq = seqs[(_head - k) % _nblk]
+        if sq == _seq - k:
+            _used = k = k + 1
+        elif sq is None:
+            k += 1      # unlesbarer Block (z.B. abgeschnitten) - ältere können noch passen
+        else:
+            break
+    for j in range(_used):
+        p = _phys(j)
+        if j < _used - 1:
+            _entries += _block_n(p, crcs[p])
+        if j == 0:
+            continue
+        sq = _seq - _used + 1 + j
+        if seqs[p] is None:
+            # unlesbarer Block: eigener (leerer) Abschnitt, danach neu suchen
+            _jumps.append(sq)
+            if j < _used - 1:
+                _jumps.append(sq + 1)
+        elif flags[p] & _F_JUMP and not (_jumps and _jumps[-1] == sq):
+            _jumps.append(sq)
+    # offener Block
+    _blk[:] = _read_block(_head)
+    recs, pos, chain, sealed, _ = _decode(_blk)
+    _blk_n, _blk_used, _blk_sealed, _chain = len(recs), pos, sealed, chain
+    _flushed_used = pos
+    if not sealed:
+        # abgerissenen Rest zählen und im RAM wieder auf 0xFF setzen
+        for i in range(pos, _SEAL_POS):
+            if _blk[i] != 0xFF:
+                _recovered += 1
+                _blk[i] = 0xFF
+    _last_ts = recs[-1][0]
+    _last_delta = recs[-1][0] - recs[-2][0] if _blk_n > 1 else 0
+    for s in range(3):
+        _prev[s] = 0
+        for rec in recs:
+            if rec[1 + s] is not None:
+                _prev[s] = rec[1 + s]
+    _entries += _blk_n
+    if _recovered:
+        print("Logger: {} Byte abgerissener Daten verworfen".format(_recovered))
+
+def _tail_text(path, limit):
+    """Letzte 'limit' Zeilen einer Textdatei: liest blockweise vom Dateiende
+    rückwärts, bis genug Zeilen da sind - Aufwand hängt von limit ab,
+    nicht von der Dateigröße."""
+    with open(path, "rb") as f:
+        f.seek(0, 2)
+        pos = f.tell()
+        blocks = []
+        newlines = 0
+        while pos > 0 and newlines <= limit:
+            n = min(_TAIL_BLOCK, pos)
+            pos -= n
+            f.seek(pos)
+            b = f.read(n)
+            blocks.insert(0, b)
+            newlines += b.count(b"\n")
+    buf = b"".join(blocks)
+    if pos > 0:
+        # erste Zeile ist angeschnitten
+        buf = buf[buf.find(b"\n") + 1:]
+    lines = [l.strip() for l in buf.decode().split("\n")]
+    lines = [l for l in lines if l]
+    return lines[-limit:] if limit > 0 else []
+
+def _replace(src, dst):
+    """src -> dst umbenennen, dst wird ersetzt (littlefs: atomar)"""
     try:
-        # Trim-Logik
-        lines = []
+        os.rename(src, dst)
+    except OSError:
         try:
-            with open(LOGFILE, "r") as f:
-                lines = f.readlines()
+            os.remove(dst)
         except OSError:
-            lines = [HEADER_LINE]
-
-        if len(lines) > MAX_LINES + 1: # +1 für den Header
-            lines = [lines[0]] + lines[-MAX_LINES:]  
-            with open(LOGFILE, "w") as f:
-                f.writelines(lines)
-        
-        # Neuen Eintrag anhängen
-        with open(LOGFILE, "a") as f:
-            f.write(line)
-            try:
-                f.flush() 
-            except:
-                pass
-    except Exception as e:
-        print("Logger add_entry error:", e)
+            pass
+        os.rename(src, dst)
+
+def _create(nblk, recs):
+    """Legt die Ringpuffer-Datei mit nblk Blöcken neu an und übernimmt recs
+    (Liste oder Generator; bei zu wenig Platz bleiben die jüngsten Einträge
+    erhalten). Die neue
+    Datei entsteht unter RINGFILE.new und ersetzt die alte erst, wenn sie
+    vollständig ist - ein Ausfall mittendrin lässt das alte Log stehen."""
+    global _fh, _nblk
+    if _fh:
+        _fh.close()
+        _fh = None
+    tmp = RINGFILE + ".new"
+    with open(tmp, "wb") as f:
+        f.write(struct.pack(_HDR_FMT, _MAGIC, nblk, BLOCK_SIZE, 0))
+        # Blöcke vorab belegen (einzeln, damit kein großer Puffer nötig ist)
+        empty = b"\xff" * BLOCK_SIZE
+        for _ in range(nblk):
+            f.write(empty)
+    _fh = open(tmp, "r+b")
+    _nblk = nblk
+    _recover()
+    for rec in recs:
+        _add(rec)
+    _flush()
+    _fh.close()
+    _fh = None
+    _replace(tmp, RINGFILE)
+    _fh = open(RINGFILE, "r+b")
+
+def _old_records(fh, nblk, head, used, keep):
+    """Einträge einer alten Ringpuffer-Datei für _create(), Block für Block
+    (ältester zuerst) - im RAM liegt immer nur ein dekodierter Block, auch bei
+    50000 Einträgen. Es werden höchstens die jüngsten keep Blöcke gelesen,
+    mehr passen in die neue Datei nicht. fh wird am Ende geschlossen, bevor
+    die neue Datei die alte ersetzt."""
+    buf = bytearray(BLOCK_SIZE)
+    for j in range(max(0, used - keep), used):
+        fh.seek(_HDR_SIZE + ((head - used + 1 + j) % nblk) * BLOCK_SIZE)
+        n = fh.readinto(buf) or 0
+        for i in range(n, BLOCK_SIZE):
+            buf[i] = 0xFF       # abgeschnittenes Dateiende zählt als leer
+        for rec in decode_block(buf):
+            yield rec
+    fh.close()
+
+def _extend():
+    """Füllt eine (nach einem Ausfall) zu kurze Datei wieder mit 0xFF auf,
+    damit spätere Schreibzugriffe keine Lücke hinterlassen"""
+    _fh.seek(0, 2)
+    size = _fh.tell()
+    end = _HDR_SIZE + _nblk * BLOCK_SIZE
+    if size >= end:
+        return
+    empty = b"\xff" * BLOCK_SIZE
+    while size < end:
+        n = min(BLOCK_SIZE, end - size)
+        _fh.write(empty[:n])
+        size += n
+    _fh.flush()
+    print("Logger: {} auf {} Byte ergänzt".format(RINGFILE, end))
 
-def get_log():
-    """Gesamte CSV (inkl. Header) für den Download"""
+def _convert(lines):
+    """CSV-Zeilen -> Einträge (Header und kaputte Zeilen werden übersprungen)"""
+    recs = []
+    for l in lines:
+        if l and not l.startswith("Zeit"):
+            rec = _parse_line(l)
+            if rec:
+                recs.append(rec)
+    return recs
+
+def _create_from_legacy(nblk):
+    """Legt das Log neu an und übernimmt dabei die letzten CAPACITY Zeilen
+    eines alten log.csv. Das CSV wird erst danach in log.csv.bak umbenannt
+    (nie gelöscht): Werte mit einem Offset, der kein Vielfaches von 1/16 °C
+    war, lassen sich im Log nur gerundet speichern."""
     try:
-        with open(LOGFILE, "r") as f:
-            return f.read()
+        lines = _tail_text(LOGFILE, CAPACITY)
     except OSError:
-        return HEADER_LINE
+        _create(nblk, [])
+        return
+    recs = _convert(lines)
+    _create(nblk, recs)
+    _replace(LOGFILE, LOGFILE + ".bak")
+    print("Logger: {} Einträge aus {} übernommen (Original: {}.bak)".format(len(recs), LOGFILE, LOGFILE))
 
-def get_log_lines(limit=100):
-    """LETZTE 'limit' DATENZEILEN (OHNE HEADER) - für Tabellenanzeige"""
+def _open():
+    """Öffnet die Ringpuffer-Datei (einmalig) und stellt den Zustand her.
+    Eine geänderte Kapazität wird in eine neu angelegte Datei übernommen."""
+    global _fh, _nblk
+    if _fh:
+        return
+    nblk = _blocks_for(CAPACITY)
     try:
-        with open(LOGFILE, "r") as f:
-            lines = f.readlines()
-            
-        if not lines:
-            return []
-            
-        # Header entfernen (die erste Zeile)
-        # Wir prüfen auf den Header, um robust zu sein, aber nehmen meistens lines[1:]
-        data_lines = lines[1:] if lines[0].strip().startswith("Zeit") else lines
-        
-        # Leere Zeilen entfernen
-        clean_lines = [l.strip() for l in data_lines if l.strip()]
-        
-        # Die letzten 'limit' Zeilen zurückgeben
-        return clean_lines[-limit:]
-
+        _fh = open(RINGFILE, "r+b")
     except OSError:
-        return []
-
-def clear_log():
-    """Log leeren und Header neu schreiben"""
+        _create_from_legacy(nblk)   # erster Start
+        return
     try:
-        with open(LOGFILE, "w") as f:
-            f.write(HEADER_LINE)
-        print("Log geleert")
+        magic, a, b, c = struct.unpack(_HDR_FMT, _fh.read(_HDR_SIZE))
+        if magic != _MAGIC or a == 0 or b != BLOCK_SIZE:
+            raise ValueError("Header ungültig")
+        _nblk = a
+        _extend()
+        _recover()
     except Exception as e:
-        print("Logger clear_log error:", e)
+        # Ein vorhandenes Log wird nie überschrieben: unlesbare Datei beiseitelegen
+        _fh.close()
+        _fh = None
+        print("✗ Logger: {} unlesbar ({}), verschoben nach {}.bad".format(RINGFILE, e, RINGFILE))
+        _replace(RINGFILE, RINGFILE + ".bad")
+        _create_from_legacy(nblk)
+        return
+    if _nblk != nblk:
+        print("Logger: Blöcke {} -> {}".format(_nblk, nblk))
+        old, _fh = _fh, None
+        try:
+            _create(nblk, _old_records(old, _nblk, _head, _used, nblk))
+        finally:
+            old.close()
+
+def configure(capacity=None, flush_records=None, flush_interval_s=None):
+    """Setzt Kapazität (Flash-Budget in Einträgen) und Flush-Regel und öffnet das Log"""
+    global CAPACITY, FLUSH_RECORDS, FLUSH_INTERVAL_S
+    with _lock:
+        if capacity:
+            CAPACITY = int(capacity)
+        if flush_records is not None:
+            FLUSH_RECORDS = max(1, int(flush_records))
+        if flush_interval_s is not None:
+            FLUSH_INTERVAL_S = max(0, int(flush_interval_s))
+        try:
+            _open()
+        except Exception as e:
+            print("Logger configure error:", e)
 
-# Initialer Header-Check beim Modul-Import
-_ensure_header()
\ No newline at end of file
+# -------------------------------------------------------
+# Öffentliche API
+# -------------------------------------------------------
+
+def add_entry(t1, t2, t3):
+    """Fügt einen Eintrag hinzu - älteste Einträge werden bei voller Kapazität überschrieben.
+    Gespeichert wird in 1/16 °C (Auflösung des DS18B20), None -> leerer CSV-Wert."""
+    add_entry_raw(to_raw(t1), to_raw(t2), to_raw(t3))
+
+def add_entry_raw(r1, r2, r3):
+    """Wie add_entry(), aber mit int-Werten in 1/16 °C (Festkomma, ohne Float).
+    Aktualisiert auch den RAM-Verlauf (history.py) und die Langzeit-Archive (rrd.py)."""
+    epoch = int(time.time())
+    _append((epoch, r1, r2, r3))
+    history.add(epoch, r1, r2, r3)
+    rrd.add(epoch, r1, r2, r3)
+
+def _append(rec):
+    with _lock:
+        try:
+            _open()
+            _add(rec)
+            if (_unflushed >= FLUSH_RECORDS
+                    or time.ticks_diff(time.ticks_ms(), _last_flush_ms) >= FLUSH_INTERVAL_S * 1000):
+                _flush()
+        except Exception as e:
+            print("Logger add_entry error:", e)
+
+def flush():
+    """Gepufferte Einträge sofort schreiben (z.B. vor machine.reset())"""
+    with _lock:
+        try:
+            if _fh:
+                _flush()
+        except Exception as e:
+            print("Logger flush error:", e)
+    rrd.flush()
+
+def stats():
+    """Zähler für /api/status"""
+    used_bytes = (_used - 1) * BLOCK_SIZE + _blk_used if _used else 0
+    return {
+        "entries": _entries,
+        "blocks": _nblk,
+        "blocks_used": _used,
+        "flash_bytes": _HDR_SIZE + _nblk * BLOCK_SIZE,
+        "bytes_per_entry": round(used_bytes / _entries, 2) if _entries else None,
+        "pending": _unflushed,
+        "sequence": _seq,
+        "recovered_bytes": _recovered,
+        "flushes": _flushes,
+        "bytes_written": _bytes_written,
+        "flush_records": FLUSH_RECORDS,
+        "flush_interval_s": FLUSH_INTERVAL_S,
+    }
+
+def _csv_lines():
+    """CSV-Zeilen (inkl. Header) Block für Block. Der Lock wird nur beim
+    Dekodieren eines Blocks gehalten, nie über ein yield hinweg; Blöcke, die
+    währenddessen überschrieben werden, fehlen im Export."""
+    with _lock:
+        try:
+            _open()
+            first, last = _seq - _used + 1, _seq
+        except Exception as e:
+            print("Logger csv error:", e)
+            first, last = 0, -1
+    yield HEADER_LINE
+    for s in range(first, last + 1):
+        with _lock:
+            oldest = _seq - _used + 1
+            if s > _seq:
+                return              # Log inzwischen gelöscht
+            if s < oldest:
+                continue
+            try:
+                recs = decode_block(_block(s - oldest))
+            except Exception as e:
+                print("Logger csv error:", e)
+                return
+        for rec in recs:
+            yield format_record(rec) + "\n"
+
+def csv_chunks(buf):
+    """Streamt die CSV durch den Puffer 'buf' (bytearray): liefert jeweils die
+    Anzahl gefüllter Bytes, der Aufrufer sendet buf[:n] vor dem nächsten
+    Schritt. Der Speicherbedarf hängt nicht von der Loggröße ab."""
+    mv = memoryview(buf)
+    n = 0
+    for line in _csv_lines():
+        b = line.encode()
+        if n + len(b) > len(buf):
+            yield n
+            n = 0
+        mv[n:n + len(b)] = b
+        n += len(b)
+    if n:
+        yield n
+
+def tail_records(limit=100):
+    """Letzte 'limit' Einträge als (ts, r1, r2, r3), ältester zuerst.
+    Dekodiert nur die jüngsten Blöcke, bis genug Einträge da sind."""
+    with _lock:
+        try:
+            _open()
+            recs = []
+            j = _used - 1
+            while j >= 0 and len(recs) < limit:
+                recs = decode_block(_block(j)) + recs
+                j -= 1
+            return recs[-limit:] if limit > 0 else []
+        except Exception as e:
+            print("Logger tail_records error:", e)
+            return []
+
+def get_log_lines(limit=100):
+    """LETZTE 'limit' DATENZEILEN (OHNE HEADER) - für Tabellenanzeige"""
+    return [format_record(rec) for rec in tail_records(limit)]
+
+def get_log_range(t_from=None, t_to=None, limit=100):
+    """Datenzeilen mit t_from <= Zeit <= t_to (Sekunden wie time.time()),
+    höchstens 'limit' ab Beginn des Fensters. Liefert (Zeilen, Treffer gesamt).
+    Einstieg per binärer Suche über die Blöcke, dekodiert wird nur das Fenster."""
+    with _lock:
+        try:
+            _open()
+            lines = []
+            total = 0
+            for rec in _scan(t_from, t_to):
+                if total < limit:
+                    lines.append(format_record(rec))
+                total += 1
+            return lines, total
+        except Exception as e:
+            print("Logger get_log_range error:", e)
+            return [], 0
+
+def downsample(t_from=None, t_to=None, points=200):
+    """Min/Max-Bucketing für Diagramme: teilt [t_from, t_to] in points/2
+    Zeit-Buckets und liefert je Sensor pro Bucket Minimum und Maximum, also
+    höchstens 'points' Punkte. Ein Durchlauf über das Fenster, blockweise
+    dekodiert, Speicher O(points). Rückgabe: 3 Listen [(ts, raw), ...] in 1/16 °C."""
+    nb = max(1, points // 2)
+    with _lock:
+        try:
+            _open()
+            if not _entries:
+                return [[], [], []]
+            if t_from is None or t_to is None:
+                t_min, t_max = _span()     # nach Uhrensprüngen nicht erster/letzter Eintrag
+                if t_from is None:
+                    t_from = t_min
+                if t_to is None:
+                    t_to = t_max
+            if t_to < t_from:
+                return [[], [], []]
+            width = (t_to - t_from) // nb + 1
+            # je Sensor und Bucket: [min_ts, min, max_ts, max]
+            buckets = [[None] * nb for _ in range(3)]
+            for rec in _scan(t_from, t_to):
+                b = (rec[0] - t_from) // width
+                for s in range(3):
+                    r = rec[1 + s]
+                    if r is None:
+                        continue
+                    mm = buckets[s][b]
+                    if mm is None:
+                        buckets[s][b] = [rec[0], r, rec[0], r]
+                    else:
+                        if r < mm[1]:
+                            mm[0], mm[1] = rec[0], r
+                        if r > mm[3]:
+                            mm[2], mm[3] = rec[0], r
+        except Exception as e:
+            print("Logger downsample error:", e)
+            return [[], [], []]
+    out = []
+    for s in range(3):
+        pts = []
+        for mm in buckets[s]:
+            if mm is None:
+                continue
+            # zeitlich geordnet ausgeben, gleicher Punkt nur einmal
+            if mm[0] == mm[2]:
+                pts.append((mm[0], mm[1]))
+            elif mm[0] < mm[2]:
+                pts.append((mm[0], mm[1]))
+                pts.append((mm[2], mm[3]))
+            else:
+                pts.append((mm[2], mm[3]))
+                pts.append((mm[0], mm[1]))
+        out.append(pts)
+    return out
+
+def clear_log():
+    """Log leeren (Datei wird leer neu angelegt)"""
+    with _lock:
+        try:
+            _open()
+            _create(_nblk, [])
+            print("Log geleert")
+        except Exception as e:
+            print("Logger clear_log error:", e)
+    history.clear()
+    rrd.clear()
@@ -28,14 +28,21 @@ import time
 from machine import Pin, I2C, unique_id
 import ubinascii
 import json
-import _thread
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 # Import der Hilfsmodule (müssen auf dem Gerät vorhanden sein)
 try:
     import webserver
     import logger
+    import history
     from ssd1306 import SSD1306
     from Klasse_DS18x20 import DS18x20
+    from measurement import MeasurementService, sleep_ms
+    from fixpoint import fmt_raw, to_raw, from_raw
 except ImportError as e:
     print("Kritischer Fehler: Modul fehlt!", e)
 
@@ -49,10 +56,27 @@ DEFAULT_CFG = {
     "ap_password": "password1234",
     "display_timeout_s": 60,
     "measure_interval_s": 2,
+    "bus_mode": "pins",   # "pins" = je Sensor ein GPIO (0/1/2), "single" = alle Sensoren an einem Bus
+    "bus_pin": 0,         # GPIO des gemeinsamen Busses im Modus "single"
+    "rescan_interval_s": 300,  # Hot-Plug-Rescan der Busse im Hintergrund (0 = aus)
+    "alarm_search": False,     # Trigger als TH/TL in die Sensoren schreiben + ALARM SEARCH
+    "alarm_check_interval_s": 5,  # Abstand der Alarm-Suchen zwischen zwei Messungen
+    "adaptive_resolution": False,  # Auflösung je Sensor nach Abstand zu den Triggern
+    "adaptive_margin_c": 2.0,      # näher als dies an low/high -> volle Auflösung
+    "adaptive_fast_bits": 9,       # Auflösung weit weg von den Triggern
+    "adaptive_full_every": 0,      # jede N-te Log-Messung mit voller Auflösung (0 = nie erzwingen)
+    "fixed_point": False,          # Messwerte als int in 1/16 °C bis zum JSON/CSV-Rand (keine Floats)
+    "read_retries": 2,             # Wiederholungen bei CRC-Fehler im Scratchpad
+    "median_window": 3,            # gleitender Median je Kanal (1 = aus)
+    "max_jump_c": 0.0,             # Sprünge > max_jump_c als Ausreißer verwerfen (0 = aus)
+    "log_capacity": 2000,          # Flash-Budget des Logs (log.ring) in Einträgen à 10 Byte
+    "log_flush_records": 10,       # Log-Puffer nach so vielen Einträgen schreiben ...
+    "log_flush_interval_s": 60,    # ... bzw. spätestens nach so vielen Sekunden
+    "history_size": 120,           # jüngste Einträge im RAM für Dashboard/Trend (10 Byte/Eintrag)
     "sensors": {
-        "A": {"enabled": True, "low_trigger": 18.0, "high_trigger": 25.0, "invert_logic": False, "offset": 0.0},
-        "B": {"enabled": True, "low_trigger": 18.0, "high_trigger": 25.0, "invert_logic": False, "offset": 0.0},
-        "C": {"enabled": True, "low_trigger": 18.0, "high_trigger": 25.0, "invert_logic": False, "offset": 0.0},
+        "A": {"enabled": True, "low_trigger": 18.0, "high_trigger": 25.0, "invert_logic": False, "offset": 0.0, "rom": ""},
+        "B": {"enabled": True, "low_trigger": 18.0, "high_trigger": 25.0, "invert_logic": False, "offset": 0.0, "rom": ""},
+        "C": {"enabled": True, "low_trigger": 18.0, "high_trigger": 25.0, "invert_logic": False, "offset": 0.0, "rom": ""},
     },
 }
 
@@ -81,6 +105,11 @@ def load_config():
                     if sk not in cfg["sensors"][lbl]:
                         cfg["sensors"][lbl][sk] = svv
 
+    # Offsets einmalig auf 1/16 °C runden (Auflösung des Logs): sonst zeigt das
+    # Dashboard z.B. 21.063, während das Log 21.062 speichert
+    for sv in cfg["sensors"].values():
+        sv["offset"] = from_raw(to_raw(sv.get("offset") or 0.0))
+
     return cfg
 
 def save_config(new_cfg):
@@ -93,6 +122,16 @@ def save_config(new_cfg):
 
 cfg = load_config()
 
+# Ringpuffer-Log mit konfigurierter Kapazität öffnen (übernimmt ggf. altes log.csv)
+logger.configure(cfg.get("log_capacity", 2000),
+                 cfg.get("log_flush_records", 10),
+                 cfg.get("log_flush_interval_s", 60))
+
+# RAM-Verlauf anlegen und mit den jüngsten Log-Einträgen vorbelegen
+history.configure(cfg.get("history_size", 120))
+for rec in logger.tail_records(history.stats()["size"]):
+    history.add(*rec)
+
 # -------------------------------------------------------
 # Globale Variablen für Screensaver
 # -------------------------------------------------------
@@ -137,27 +176,14 @@ except Exception as e:
 # Interrupt Handler für BOOT-Button (Wake)
 # -------------------------------------------------------
 
-def handle_wake_irq(pin):
-    global display_on, last_activity_ms
+wake_pending = False  # vom IRQ gesetzt, vom Screensaver-Task abgeholt
 
+def handle_wake_irq(pin):
+    """IRQ: nur Zeitstempel + Flag setzen - Display/LED schaltet der
+    Screensaver-Task, damit nur ein Task das OLED anfasst"""
+    global last_activity_ms, wake_pending
     last_activity_ms = time.ticks_ms()
-
-    if not display_on:
-        display_on = True
-        set_led(True)
-        print("🔔 Wake: Display EIN")
-
-        # Display sofort aktualisieren (Platzhalter)
-        if oled:
-            try:
-                oled.fill(0)
-                oled.text("-THERMO-", 0, 0)
-                oled.text("A: --", 0, 12)
-                oled.text("B: --", 0, 22)
-                oled.text("C: --", 0, 32)
-                oled.show()
-            except Exception as e:
-                print("⚠️ Display IRQ Error:", e)
+    wake_pending = True
 
 try:
     wake_button = Pin(9, Pin.IN, Pin.PULL_UP)
@@ -172,35 +198,115 @@ except Exception as e:
 
 print("\n--- Initialisiere Sensoren ---")
 
-sensor1 = DS18x20(pin=0, resolution=cfg["resolution"], name="Sensor_A")
-sensor2 = DS18x20(pin=1, resolution=cfg["resolution"], name="Sensor_B")
-sensor3 = DS18x20(pin=2, resolution=cfg["resolution"], name="Sensor_C")
-
-sensors = [sensor1, sensor2, sensor3]
 SENSOR_LABELS = ["A", "B", "C"]
 
-# ROM-Adressen sammeln
-roms = []
+def assign_channels(bus):
+    """Multi-Drop: ordnet die ROMs eines Busses den Kanälen A/B/C zu.
+    Gespeicherte ROM-Adressen (cfg sensors.X.rom) haben Vorrang, Kanäle ohne
+    gespeicherte ROM bekommen die übrigen Sensoren in Scan-Reihenfolge.
+    Neue Zuordnungen werden gespeichert, damit die Kanäle nach einem Neustart
+    stabil bleiben. Fehlt der gespeicherte Sensor eines Kanals (Aussetzer beim
+    Rescan, Wackelkontakt), bleibt der Kanal leer, bis er wieder da ist - ein
+    Relais-Kanal springt nie auf einen Reserve-Fühler. Für einen getauschten
+    Fühler die ROM des Kanals in config.json leeren (sensors.X.rom = "")."""
+    found = [info.serial for info in bus.infos]
+    channels = [None] * len(SENSOR_LABELS)
+    used = set()
+
+    for i, lbl in enumerate(SENSOR_LABELS):
+        want = cfg["sensors"][lbl].get("rom", "").upper()
+        if want and want in found:
+            idx = found.index(want)
+            channels[i] = (bus, idx)
+            used.add(idx)
+
+    changed = False
+    free = [idx for idx in range(len(found)) if idx not in used]
+    for i, lbl in enumerate(SENSOR_LABELS):
+        if channels[i] is not None:
+            continue
+        if cfg["sensors"][lbl].get("rom"):
+            print(f"  Kanal {lbl}: {cfg['sensors'][lbl]['rom']} fehlt")
+        elif free:
+            idx = free.pop(0)
+            channels[i] = (bus, idx)
+            cfg["sensors"][lbl]["rom"] = found[idx]
+            changed = True
+
+    if free:
+        print(f"  {len(free)} Sensor(en) am Bus ohne Kanal-Zuordnung")
+    if changed:
+        save_config(cfg)
+    return channels
+
+# Persistente ROM-Tabelle (neben config.json): bekannte Sensoren je Bus-GPIO
+ROM_TABLE_FILE = "roms.json"
+
+def load_rom_table():
+    try:
+        with open(ROM_TABLE_FILE) as f:
+            return json.load(f)
+    except:
+        return {}
+
+def save_rom_table(table):
+    try:
+        with open(ROM_TABLE_FILE, "w") as f:
+            json.dump(table, f)
+        print("✓ ROM-Tabelle gespeichert.")
+    except Exception as e:
+        print("✗ Fehler beim Speichern der ROM-Tabelle:", e)
+
+def build_rom_table():
+    table = {}
+    for s in sensors:
+        table[str(s.pin_no)] = s.table_entry()
+    return table
+
+def build_channels():
+    """Kanal-Zuordnung (bus, rom_index) je Label aus dem aktuellen Bus-Zustand"""
+    if cfg.get("bus_mode") == "single":
+        return assign_channels(sensors[0])
+    return [(s, 0) if s.initialized and s.roms else None for s in sensors]
+
+rom_table = load_rom_table()
+
+if cfg.get("bus_mode") == "single":
+    # Ein Bus, viele Sensoren: eine Wandlung (SKIP ROM) für alle, GPIO 1/2 bleiben frei
+    bus_pin = cfg.get("bus_pin", 0)
+    sensors = [DS18x20(pin=bus_pin, resolution=cfg["resolution"], name="Bus")]
+else:
+    sensors = [
+        DS18x20(pin=0, resolution=cfg["resolution"], name="Sensor_A"),
+        DS18x20(pin=1, resolution=cfg["resolution"], name="Sensor_B"),
+        DS18x20(pin=2, resolution=cfg["resolution"], name="Sensor_C"),
+    ]
+
 for sensor in sensors:
+    sensor.retries = cfg.get("read_retries", 2)
     try:
-        rom = sensor.roms[0] if sensor.init() and sensor.roms else None
-        roms.append(rom)
+        sensor.init(rom_table.get(str(sensor.pin_no)))
     except Exception as e:
         print(f"✗ Fehler bei Sensor Init {sensor.name}: {e}")
-        roms.append(None)
-
-# ROM-Infos für Webserver (Familie + Serial)
-rom_info = []
-for rom in roms:
-    if rom:
-        family = rom[0]
-        serial_hex = "".join("{:02X}".format(b) for b in rom)
-        rom_info.append({
-            "family": f"0x{family:02X}",
-            "serial": serial_hex,
-        })
-    else:
-        rom_info.append(None)
+
+channels = build_channels()
+
+# Tabelle nur schreiben, wenn sich etwas geändert hat (schont den Flash)
+new_rom_table = build_rom_table()
+rom_table_changed = new_rom_table != rom_table
+if rom_table_changed:
+    save_rom_table(new_rom_table)
+
+# ROM-Adressen je Kanal sammeln
+roms = []
+rom_info = []  # SensorInfo je Kanal für Webserver (Familie, Serial, ROM-String)
+
+def update_rom_info():
+    """ROM-Listen je Kanal neu aufbauen - in place, damit der Webserver sie live sieht"""
+    roms[:] = [ch[0].roms[ch[1]] if ch else None for ch in channels]
+    rom_info[:] = [ch[0].infos[ch[1]] if ch else None for ch in channels]
+
+update_rom_info()
 
 print("--- Sensoren initialisiert ---\n")
 
@@ -208,42 +314,54 @@ if oled:
     oled.fill(0)
     oled.text("-SENSORS-", 0, 0)
     y = 12
-    for i, rom in enumerate(roms):
+    for i, info in enumerate(rom_info):
         label = SENSOR_LABELS[i]
-        if rom:
-            ser = "".join("{:02X}".format(b) for b in rom)
-            oled.text(f"{label}:{ser[-6:]}", 0, y)
+        if info:
+            oled.text(f"{label}:{info.serial[-6:]}", 0, y)
         else:
             oled.text(f"{label}: --", 0, y)
         y += 10
     oled.show()
-    time.sleep(3)
+    # Nur bei geänderter Hardware anzeigen lassen, sonst sofort messen
+    if rom_table_changed:
+        time.sleep(3)
 
 # -------------------------------------------------------
-# Temperatur lesen (Helper) - MIT OFFSET
+# Messdienst (besitzt die Busse) - MIT OFFSET
 # -------------------------------------------------------
 
-def read_temps():
-    """Liest aktuelle Temperaturen von allen Sensoren und wendet Offset an"""
-    temps = []
-    for i, sensor in enumerate(sensors):
-        val = None
-        try:
-            res = sensor.read()
-            if isinstance(res, list) and res:
-                val = res[0]
-            elif isinstance(res, (float, int)):
-                val = res
-            
-            # Offset anwenden
-            if val is not None:
-                label = SENSOR_LABELS[i]
-                offset = cfg["sensors"].get(label, {}).get("offset", 0.0)
-                val = val + offset
-        except:
-            pass
-        temps.append(val)
-    return temps
+measurement = MeasurementService(channels, SENSOR_LABELS, cfg)
+
+if cfg.get("alarm_search"):
+    measurement.program_alarms()
+
+async def read_temps(full=False):
+    """Misst alle Sensoren (über den Messdienst) und liefert die Temperaturen mit Offset"""
+    return await measurement.measure(full)
+
+async def rescan_sensors():
+    """Hot-Plug: alle Busse neu absuchen und Kanäle/ROM-Infos live aktualisieren"""
+    global channels
+    async with measurement.lock:
+        changed = False
+        for sensor in sensors:
+            if sensor.rescan():
+                changed = True
+        if not changed:
+            return False
+        channels = build_channels()
+        measurement.set_channels(channels)
+        update_rom_info()
+        if cfg.get("alarm_search"):
+            measurement.program_alarms()
+    save_rom_table(build_rom_table())
+    return True
+
+def fmt_temp(t, width=0):
+    """Temperatur mit 3 Nachkommastellen - im Festkomma-Modus ohne Float"""
+    if measurement.fixed:
+        return fmt_raw(t, width)
+    return ("{:%d.3f}" % width).format(t)
 
 def get_sensor_cfg(idx):
     """Holt Konfiguration für einen Sensor"""
@@ -268,8 +386,7 @@ def update_trigger_outputs(temps):
             pin.value(0)
             continue
 
-        low = scfg.get("low_trigger", 18.0)
-        high = scfg.get("high_trigger", 25.0)
+        low, high = measurement.limits[i]  # gleiche Einheit wie t (°C oder 1/16 °C)
         invert = scfg.get("invert_logic", False)
 
         # Grundlogik (nicht invertiert):
@@ -288,29 +405,18 @@ def update_trigger_outputs(temps):
         pin.value(out)
 
 # -------------------------------------------------------
-# Webserver Thread
-# -------------------------------------------------------
-
-def webserver_thread():
-    try:
-        webserver.start_webserver(
-            roms=roms, cfg=cfg, save_cb=save_config, get_temps=read_temps, rom_info=rom_info
-        )
-    except Exception as e:
-        print("✗ Webserver Crash:", e)
-
-try:
-    _thread.start_new_thread(webserver_thread, ())
-    print("✓ Webserver Thread gestartet.")
-except Exception as e:
-    print("✗ Thread konnte nicht starten:", e)
-
-# -------------------------------------------------------
-# Screensaver Check
+# Screensaver-Task (einziger Besitzer von Display-Zustand und LED)
 # -------------------------------------------------------
 
 def check_screensaver():
-    global display_on
+    global display_on, wake_pending
+
+    if wake_pending:
+        wake_pending = False
+        if not display_on:
+            display_on = True
+            set_led(True)
+            print("🔔 Wake: Display EIN")
 
     if not display_on:
         return
@@ -328,83 +434,148 @@ def check_screensaver():
         set_led(False)
         print("📴 Screensaver: Display OFF")
 
+async def screensaver_task():
+    while True:
+        try:
+            check_screensaver()
+        except Exception as e:
+            print(f"❌ Screensaver Error: {e}")
+        await sleep_ms(100)
+
+# -------------------------------------------------------
+# OLED-Task: zeichnet den letzten Snapshot (nur bei neuem Wert / Wake)
+# -------------------------------------------------------
+
+def draw_oled(temps):
+    oled.fill(0)
+    oled.text("-THERMO-", 0, 0)
+    y_pos = 12
+    for i, t in enumerate(temps):
+        lbl = SENSOR_LABELS[i]
+        scfg = get_sensor_cfg(i)
+
+        if not scfg.get("enabled", True) or t is None:
+            oled.text(f"{lbl}: --", 0, y_pos)
+            y_pos += 10
+        else:
+            low, high = measurement.limits[i]
+
+            temp_str = fmt_temp(t, 6)
+            status_str = ""
+
+            if t < low:
+                status_str = "_" + temp_str  # LOW
+            elif t > high:
+                status_str = temp_str + "_"  # HIGH
+            else:
+                status_str = temp_str       # Normal
+
+            oled.text(f"{lbl}:{status_str}", 0, y_pos)
+            y_pos += 10
+
+    oled.show()
+
+async def oled_task():
+    shown = None  # (seq, display_on) der letzten Anzeige
+    while True:
+        try:
+            snap = measurement.snapshot()
+            if oled and display_on and shown != (snap[0], True):
+                draw_oled(snap[3])
+                shown = (snap[0], True)
+            elif not display_on:
+                shown = None
+        except Exception as e:
+            print(f"❌ OLED Error: {e}")
+        await sleep_ms(100)
+
 # -------------------------------------------------------
-# HAUPTSCHLEIFE
+# Mess-Task: Messung, Trigger-GPIOs, Logger
 # -------------------------------------------------------
 
 update_count = 0
-last_read_ms = time.ticks_ms()
-temps = [None, None, None]
 
-print("🚀 Starte Hauptschleife...\n")
+async def measure_task():
+    global update_count
+    while True:
+        start_ms = time.ticks_ms()
+        try:
+            full_every = cfg.get("adaptive_full_every", 0)
+            full = full_every > 0 and update_count % full_every == 0
+            temps = await read_temps(full)  # Liest Temperatur MIT Offset
 
-while True:
-    try:
-        # 1. Screensaver
-        check_screensaver()
-
-        # 2. Temps messen (Intervall-Check)
-        current_ms = time.ticks_ms()
-        measure_interval_ms = cfg.get("measure_interval_s", 2) * 1000
-        
-        if time.ticks_diff(current_ms, last_read_ms) >= measure_interval_ms:
-            temps = read_temps()  # Liest Temperatur MIT Offset
-            last_read_ms = current_ms
-            
-            # 3. Trigger-GPIOs aktualisieren
+            # Trigger-GPIOs aktualisieren
             update_trigger_outputs(temps)
-            
-            # 4. Logger
-            v1 = temps[0] if temps[0] is not None else None
-            v2 = temps[1] if temps[1] is not None else None
-            v3 = temps[2] if temps[2] is not None else None
-            logger.add_entry(v1, v2, v3)
+
+            # Logger
+            v1, v2, v3 = temps[0], temps[1], temps[2]
+            if measurement.fixed:
+                logger.add_entry_raw(v1, v2, v3)
+            else:
+                logger.add_entry(v1, v2, v3)
             update_count += 1
-            
-            # 5. Print
-            a_str = f"{v1:.3f}" if v1 is not None else "None"
-            b_str = f"{v2:.3f}" if v2 is not None else "None"
-            c_str = f"{v3:.3f}" if v3 is not None else "None"
+
+            a_str = fmt_temp(v1) if v1 is not None else "None"
+            b_str = fmt_temp(v2) if v2 is not None else "None"
+            c_str = fmt_temp(v3) if v3 is not None else "None"
             print(f"[{update_count}] A:{a_str}° B:{b_str}° C:{c_str}°")
+        except Exception as e:
+            print(f"❌ Measure Error: {e}")
+            await asyncio.sleep(5)
 
-        # 6. OLED Anzeige (unabhängig vom Messintervall)
-        if display_on and oled:
-            oled.fill(0)
-            oled.text("-THERMO-", 0, 0)
-            y_pos = 12
-            for i, t in enumerate(temps):
-                lbl = SENSOR_LABELS[i]
-                scfg = get_sensor_cfg(i)
-
-                if not scfg.get("enabled", True) or t is None:
-                    oled.text(f"{lbl}: --", 0, y_pos)
-                    y_pos += 10
-                else:
-                    low = scfg.get("low_trigger", 18.0)
-                    high = scfg.get("high_trigger", 25.0)
-
-                    temp_str = "{:6.3f}".format(t)
-                    status_str = ""
-
-                    if t < low:
-                        status_str = "_" + temp_str  # LOW
-                    elif t > high:
-                        status_str = temp_str + "_"  # HIGH
-                    else:
-                        status_str = temp_str       # Normal
-
-                    oled.text(f"{lbl}:{status_str}", 0, y_pos)
-                    y_pos += 10
+        # Rest des Intervalls warten (Wandlungszeit zählt mit)
+        interval_ms = cfg.get("measure_interval_s", 2) * 1000
+        await sleep_ms(max(0, interval_ms - time.ticks_diff(time.ticks_ms(), start_ms)))
 
-            oled.show()
-            set_led(True)
+# -------------------------------------------------------
+# Alarm-Modus und Hot-Plug-Rescan
+# -------------------------------------------------------
+
+async def alarm_task():
+    """Zwischen den Messungen nur "ist etwas außerhalb?" per ALARM SEARCH"""
+    while True:
+        await sleep_ms(cfg.get("alarm_check_interval_s", 5) * 1000)
+        try:
+            update_trigger_outputs(await measurement.check_alarms())
+        except Exception as e:
+            print(f"❌ Alarm Check Error: {e}")
+
+async def rescan_task(rescan_ms):
+    """Niedrige Priorität: wartet auf den Bus-Lock, bis keine Messung läuft"""
+    while True:
+        await sleep_ms(rescan_ms)
+        try:
+            await rescan_sensors()
+        except Exception as e:
+            print(f"❌ Rescan Error: {e}")
 
-        # 7. Kurzer Sleep für Responsiveness
-        time.sleep_ms(100)
+# -------------------------------------------------------
+# Eventloop: Webserver + Tasks (keine Threads)
+# -------------------------------------------------------
 
-    except KeyboardInterrupt:
-        print("\n⏹️ Benutzer-Stopp")
-        break
+async def main():
+    try:
+        server = await webserver.start_webserver(
+            roms=roms, cfg=cfg, save_cb=save_config, get_snapshot=measurement.get, rom_info=rom_info,
+            get_stats=measurement.stats, wait_snapshot=measurement.wait
+        )
+        print("✓ Webserver gestartet.")
     except Exception as e:
-        print(f"❌ Main Loop Error: {e}")
-        time.sleep(5)
+        print("✗ Webserver konnte nicht starten:", e)
+        server = None
+
+    tasks = [measure_task(), oled_task(), screensaver_task()]
+    if cfg.get("alarm_search"):
+        tasks.append(alarm_task())
+    rescan_ms = cfg.get("rescan_interval_s", 300) * 1000
+    if rescan_ms > 0:
+        tasks.append(rescan_task(rescan_ms))
+
+    print("🚀 Starte Eventloop...\n")
+    await asyncio.gather(*tasks)
+
+try:
+    asyncio.run(main())
+except KeyboardInterrupt:
+    print("\n⏹️ Benutzer-Stopp")
+    logger.flush()
@@ -0,0 +1,362 @@
+# measurement.py - Messdienst: besitzt die One-Wire-Busse und veröffentlicht den letzten Messwert-Satz
+
+import time
+from fixpoint import to_raw, SCALE
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+POLL_INTERVAL_MS = 5  # Abfrageintervall "Wandlung fertig" über alle Busse
+
+def sleep_ms(ms):
+    """Awaitable Pause in ms (uasyncio und CPython-asyncio)"""
+    return asyncio.sleep(ms / 1000)
+
+
+class MedianFilter:
+    """Gleitender Median über ein festes Fenster (O(1) Speicher je Kanal) mit
+    optionaler Sprung-Sperre: Werte, die weiter als max_jump vom letzten
+    Ergebnis entfernt sind, werden verworfen - außer sie bestätigen sich
+    über ein ganzes Fenster (echter Temperatursprung)."""
+
+    __slots__ = ("window", "max_jump", "ring", "pos", "count", "last", "rejected", "missing", "outliers")
+
+    def __init__(self, window=3, max_jump=None):
+        self.window = window if window and window > 1 else 1
+        self.max_jump = max_jump or None
+        self.ring = [0] * self.window
+        self.pos = 0
+        self.count = 0
+        self.last = None      # letzter ausgegebener Wert
+        self.rejected = 0     # aufeinanderfolgende verworfene Sprünge
+        self.missing = 0      # aufeinanderfolgende ungültige Messungen
+        self.outliers = 0     # Zähler verworfener Ausreißer
+
+    def update(self, x):
+        if x is None:
+            # Ungültige Messung: letzten Wert kurz halten, dann None
+            self.missing += 1
+            if self.missing >= self.window:
+                self.last = None
+                self.count = 0
+            return self.last
+        self.missing = 0
+
+        if self.max_jump is not None and self.last is not None and abs(x - self.last) > self.max_jump:
+            self.rejected += 1
+            if self.rejected < self.window:
+                self.outliers += 1
+                return self.last
+            self.count = 0  # Sprung bestätigt: Fenster neu füllen
+        self.rejected = 0
+
+        self.ring[self.pos] = x
+        self.pos = (self.pos + 1) % self.window
+        if self.count < self.window:
+            self.count += 1
+
+        if self.count < self.window:
+            self.last = x
+        elif self.window == 3:
+            a, b, c = self.ring
+            self.last = max(min(a, b), min(max(a, b), c))
+        else:
+            self.last = sorted(self.ring)[self.window // 2]
+        return self.last
+
+
+class MeasurementService:
+    """Einziger Besitzer der DS18x20-Busse.
+    Messungen laufen nur über measure(); alle anderen Verbraucher (OLED, Webserver)
+    lesen den zuletzt veröffentlichten Snapshot ohne Bus-Zugriff.
+    measure(), check_alarms() und get() sind Coroutinen: während der Wandlung
+    wird gewartet (await), der Eventloop bedient solange Webserver und OLED.
+
+    channels: pro Label ein Tupel (bus, rom_index) oder None. Mehrere Kanäle
+    dürfen sich einen Bus teilen (Multi-Drop) - jeder Bus wird pro Zyklus
+    nur einmal gewandelt und ausgelesen."""
+
+    def __init__(self, channels, labels, cfg):
+        self.labels = labels
+        self.cfg = cfg
+        # Festkomma: Messwerte als int in 1/16 °C statt float (siehe fixpoint.py)
+        self.fixed = bool(cfg.get("fixed_point"))
+        self.load_limits()
+        self.filters = [self._make_filter() for _ in labels]
+        self.first_measure_ms = None  # Boot -> erste Messung (ticks_ms seit Reset)
+        self.set_channels(channels)
+        self.lock = asyncio.Lock()  # Bus-Zugriff nur mit Lock (auch über await hinweg)
+        # Snapshot als ein Tupel, damit Leser ihn atomar übernehmen:
+        # (seq, zeitstempel_s, ticks_ms, temps)
+        self._snapshot = (0, None, None, [None] * len(labels))
+        self._changed = asyncio.Event()  # wird je neuem Snapshot gesetzt und ersetzt (weckt alle Wartenden)
+        self.alarm_checks = 0        # Alarm-Suchen (Hardware-TH/TL)
+        self.alarm_detail_reads = 0  # davon einzeln gelesene Sensoren
+        self.adaptive_saved_ms = 0   # eingesparte Wandlungszeit (Tabellenwerte) durch adaptive Auflösung
+        self.adaptive_fast_cycles = 0
+
+    def set_channels(self, channels):
+        """Kanal-Zuordnung setzen (z.B. nach Hot-Plug-Rescan); Aufrufer hält den Lock"""
+        buses = []
+        for ch in channels:
+            if ch and ch[0] not in buses:
+                buses.append(ch[0])
+        self.channels = channels
+        self.buses = buses
+
+    def load_limits(self):
+        """Offset und Trigger je Kanal einmalig in die Einheit der Messwerte
+        umrechnen (°C oder 1/16 °C), damit der Messzyklus nichts umrechnet."""
+        unit = to_raw if self.fixed else (lambda v: v)
+        self.offsets = []
+        self.limits = []
+        for lbl in self.labels:
+            scfg = self.cfg["sensors"].get(lbl, {})
+            self.offsets.append(unit(scfg.get("offset", 0.0)))
+            self.limits.append((unit(scfg.get("low_trigger", 18.0)), unit(scfg.get("high_trigger", 25.0))))
+
+    def _make_filter(self):
+        max_jump = self.cfg.get("max_jump_c", 0.0)
+        if max_jump and self.fixed:
+            max_jump = to_raw(max_jump)
+        return MedianFilter(self.cfg.get("median_window", 3), max_jump)
+
+    def _offset(self, i):
+        return self.offsets[i]
+
+    async def _convert_all(self):
+        """Phase 1 + 2 eines Zyklus: Wandlung starten und auf alle Busse warten"""
+        # Phase 1: Wandlung auf allen Bussen gemeinsam starten (SKIP ROM Broadcast)
+        pending = []
+        for bus in self.buses:
+            try:
+                if bus.start_conversion():
+                    pending.append(bus)
+            except:
+                pass
+
+        # Phase 2: alle Busse pollen, bis jeder fertig ist (Tabellenzeit = Timeout)
+        while pending:
+            pending = [bus for bus in pending if not bus.conversion_done()]
+            if pending:
+                await sleep_ms(POLL_INTERVAL_MS)
+
+    def _plan_resolution(self, full=False):
+        """Adaptiver Modus: Auflösung je Sensor nach Abstand zu den Triggern.
+        Weit weg von low/high reicht die schnelle Auflösung (9 bit = 94 ms),
+        nahe einer Schwelle, ohne Vorwert oder mit full=True gilt wieder die
+        konfigurierte Auflösung. Geschrieben wird nur bei einem Wechsel."""
+        if not self.cfg.get("adaptive_resolution"):
+            return
+        margin = self.cfg.get("adaptive_margin_c", 2.0)
+        if self.fixed:
+            margin = to_raw(margin)
+        fast = self.cfg.get("adaptive_fast_bits", 9)
+        temps = self._snapshot[3]
+
+        mapped = set()
+        for i, ch in enumerate(self.channels):
+            if not ch:
+                continue
+            bus, idx = ch
+            rom = bus.roms[idx]
+            mapped.add(bytes(rom))
+            t = temps[i]
+            low, high = self.limits[i]
+            near = t is None or abs(t - low) <= margin or abs(t - high) <= margin
+            bus.set_rom_resolution(rom, bus.resolution if full or near else min(fast, bus.resolution))
+
+        # Sensoren ohne Kanal (Multi-Drop) sollen die Wandlung nicht ausbremsen
+        for bus in self.buses:
+            for rom in bus.roms:
+                if bytes(rom) not in mapped:
+                    bus.set_rom_resolution(rom, min(fast, bus.resolution))
+
+        if self.buses:
+            base = max(bus.conversion_time_ms for bus in self.buses)
+            now = max(bus.timeout_ms() for bus in self.buses)
+            if now < base:
+                self.adaptive_saved_ms += base - now
+                self.adaptive_fast_cycles += 1
+
+    async def _read_cycle(self, full=False):
+        """Ein Messzyklus: Wandlung auf allen Bussen starten, einmal warten,
+        dann alle Scratchpads lesen und Offset anwenden."""
+        self._plan_resolution(full)
+        await self._convert_all()
+
+        # Phase 3: Scratchpads aller Busse lesen (N Sensoren = N Scratchpads)
+        results = {}
+        for bus in self.buses:
+            try:
+                results[id(bus)] = bus.collect(raw=self.fixed)
+            except:
+                results[id(bus)] = None
+
+        # Phase 4: Werte per ROM-Index den Kanälen zuordnen + Offset
+        temps = []
+        for i, ch in enumerate(self.channels):
+            val = None
+            try:
+                if ch:
+                    res = results.get(id(ch[0]))
+                    if isinstance(res, list) and ch[1] < len(res):
+                        val = res[ch[1]]
+
+                # Offset anwenden
+                if val is not None:
+                    val = val + self._offset(i)
+            except:
+                val = None
+            # Median/Ausreißer-Filter, damit Glitches weder GPIO noch Log erreichen
+            temps.append(self.filters[i].update(val) if ch else None)
+        return temps
+
+    def _publish(self, temps):
+        now = time.ticks_ms()
+        if self.first_measure_ms is None:
+            self.first_measure_ms = now
+            print(f"⏱️ Boot bis erste Messung: {now} ms")
+        self._snapshot = (self._snapshot[0] + 1, time.time(), now, temps)
+        ev = self._changed
+        self._changed = asyncio.Event()
+        ev.set()
+
+    async def measure(self, full=False):
+        """Führt eine Messung durch und veröffentlicht sie als neuen Snapshot.
+        full=True erzwingt im adaptiven Modus die volle Auflösung."""
+        async with self.lock:
+            temps = await self._read_cycle(full)
+            self._publish(temps)
+        return temps
+
+    def program_alarms(self):
+        """Schreibt low_trigger/high_trigger jedes Kanals als TH/TL ins Scratchpad.
+        Der Sensor vergleicht nur ganze Grad (abgerundet) - die Grenzen werden
+        deshalb konservativ gewählt: jede echte Über-/Unterschreitung setzt das
+        Alarm-Flag, Fehlalarme knapp innerhalb klärt der Detail-Read.
+        Aufrufer hält den Lock (bzw. ruft vor dem Start der Tasks auf)."""
+        for i, ch in enumerate(self.channels):
+            if not ch:
+                continue
+            low, high = self.limits[i]
+            offset = self._offset(i)
+            high = high - offset
+            low = low - offset
+            if self.fixed:
+                high = high / SCALE
+                low = low / SCALE
+            th = int(high // 1)         # floor(T) >= TH  <=  T > high
+            tl = -int((-low) // 1) - 1  # floor(T) <= TL  <=  T < low
+            try:
+                ch[0].write_alarm(ch[0].roms[ch[1]], th, tl)
+            except Exception as e:
+                print(f"✗ TH/TL {self.labels[i]}: {e}")
+
+    def _out_of_range(self, i, t):
+        if t is None:
+            return True
+        low, high = self.limits[i]
+        return t < low or t > high
+
+    async def check_alarms(self):
+        """Schneller Zyklus im Alarm-Modus: Wandlung + ALARM SEARCH je Bus.
+        Nur alarmierte Sensoren (und solche, deren letzter Wert außerhalb lag)
+        werden einzeln gelesen; alle anderen behalten ihren letzten Wert.
+        Gibt die aktualisierten Temperaturen zurück."""
+        async with self.lock:
+            temps = list(self._snapshot[3])
+            self._plan_resolution()
+            await self._convert_all()
+
+            alarmed = set()
+            for bus in self.buses:
+                try:
+                    alarmed.update(bytes(r) for r in bus.alarm_search())
+                except Exception as e:
+                    print(f"{bus.name} Alarm-Suche Fehler: {e}")
+            self.alarm_checks += 1
+
+            # Detail-Reads je Bus sammeln
+            wanted = {}
+            for i, ch in enumerate(self.channels):
+                if not ch:
+                    continue
+                rom = ch[0].roms[ch[1]]
+                if bytes(rom) in alarmed or self._out_of_range(i, temps[i]):
+                    wanted.setdefault(id(ch[0]), (ch[0], []))[1].append((i, rom))
+
+            for bus in self.buses:
+                entry = wanted.get(id(bus))
+                vals = bus.collect([rom for _, rom in entry[1]] if entry else [], raw=self.fixed)
+                if not entry:
+                    continue
+                for (i, _), val in zip(entry[1], vals or []):
+                    temps[i] = self.filters[i].update(None if val is None else val + self._offset(i))
+                    self.alarm_detail_reads += 1
+
+            if wanted:
+                self._publish(temps)
+        return temps
+
+    def stats(self):
+        """Status-/Latenz-Daten des Messdienstes (ohne Bus-Zugriff)"""
+        return {
+            "seq": self._snapshot[0],
+            "age_ms": self.age_ms(),
+            "boot_to_first_measurement_ms": self.first_measure_ms,
+            "conversion": [bus.conversion_stats() for bus in self.buses],
+            "alarm_checks": self.alarm_checks,
+            "alarm_detail_reads": self.alarm_detail_reads,
+            "read": [bus.read_stats() for bus in self.buses],
+            "outliers": [f.outliers for f in self.filters],
+            "adaptive_saved_ms": self.adaptive_saved_ms,
+            "adaptive_fast_cycles": self.adaptive_fast_cycles,
+            "sensors": [bus.to_dict() for bus in self.buses],
+            "resolution": [ch[0].rom_resolution(ch[0].roms[ch[1]]) if ch else None for ch in self.channels],
+        }
+
+    def snapshot(self):
+        """Letzter Snapshot (seq, zeitstempel_s, ticks_ms, temps) - ohne Bus-Zugriff.
+        Im Festkomma-Modus sind temps ints in 1/16 °C."""
+        return self._snapshot
+
+    def age_ms(self, snap=None):
+        """Alter eines Snapshots in ms (None = noch keine Messung)"""
+        snap = snap or self._snapshot
+        if snap[2] is None:
+            return None
+        return time.ticks_diff(time.ticks_ms(), snap[2])
+
+    async def wait(self, seq, timeout=None):
+        """Wartet, bis ein neuerer Snapshot als 'seq' vorliegt (z.B. für den
+        SSE-Stream). True bei neuem Snapshot, False nach timeout Sekunden."""
+        ev = self._changed
+        if self._snapshot[0] != seq:
+            return True
+        try:
+            await asyncio.wait_for(ev.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def get(self, max_age=None):
+        """Snapshot holen. Mit max_age (Sekunden) wird nur dann neu gemessen,
+        wenn der Snapshot älter ist - läuft gerade eine Messung, wird deren
+        Ergebnis abgewartet statt eine zweite zu starten."""
+        snap = self._snapshot
+        if max_age is None:
+            return snap
+
+        age = self.age_ms(snap)
+        if age is not None and age <= max_age * 1000:
+            return snap
+
+        async with self.lock:
+            if self._snapshot[0] != snap[0]:
+                # Mess-Task hat inzwischen gemessen
+                return self._snapshot
+            self._publish(await self._read_cycle())
+        return self._snapshot
@@ -0,0 +1,254 @@
+# rrd.py - Langzeit-Archive (RRD-Prinzip) für die Temperaturverläufe
+#
+# Neben dem Rohdaten-Log (logger.py) werden die Messwerte pro Sensor zu
+# Minuten-, Stunden- und Tageswerten (min/max/avg) verdichtet. Jedes Archiv
+# hat eine feste Zeilenzahl, die Datei (rrd.bin) wächst also nie:
+#   Header: Magic "RRD2" + Anzahl Archive + je (step, rows)
+#   je Archiv rows Zeilen zu ROW_SIZE = 28 Byte:
+#     uint32 Bucket-Start + 3x (min, max, avg) als int16 in 1/16 °C
+#     + 3x Anzahl Messwerte als uint16 (für das Weiterzählen nach Neustart)
+# Die Zeile eines Buckets liegt immer im Slot (ts // step) % rows. Dadurch
+# braucht es keinen Schreibzeiger; veraltete Zeilen erkennt man am Zeitstempel.
+# Der laufende Bucket wird im RAM aufsummiert und beim Wechsel geschrieben.
+# Steht der Bucket schon in der Datei (Neustart mitten im Bucket), wird dort
+# weitergezählt. Springt die Uhr zurück (Boot ohne RTC: 2000-01-01), beginnt
+# ein neuer Bucket; eine Zeile mit neuerem Zeitstempel wird nie überschrieben.
+
+import time
+import struct
+import _thread
+
+RRDFILE = "rrd.bin"
+
+# (Schrittweite s, Zeilen) - 2 h Minuten, 7 Tage Stunden, ~6 Monate Tage
+# = 474 Zeilen * 28 Byte, gut 13 KB Flash
+ARCHIVES = ((60, 120), (3600, 168), (86400, 186))
+
+NULL_RAW = -32768       # wie logger.NULL_RAW
+ROW_FMT = "<I9h3H"      # Bucket-Start, je Sensor min/max/avg, je Sensor Anzahl
+ROW_SIZE = 28
+_MAX_N = 0xFFFF         # Anzahl sättigt (1-s-Takt: 86400 Werte pro Tag)
+_EMPTY_TS = 0xFFFFFFFF  # unbelegte Zeile (Datei wird mit 0xFF angelegt)
+_MAGIC = b"RRD2"
+_READ_ROWS = 32         # Zeilen pro Lesezugriff
+
+_lock = _thread.allocate_lock()
+_fh = None
+_offsets = []           # Dateiposition der Archive
+_acc = []               # je Archiv: [bucket, [min, max, sum, n] x 3] oder None
+
+# -------------------------------------------------------
+# Datei
+# -------------------------------------------------------
+
+def _header():
+    hdr = _MAGIC + struct.pack("<H", len(ARCHIVES))
+    for step, rows in ARCHIVES:
+        hdr += struct.pack("<II", step, rows)
+    return hdr
+
+def _open():
+    """Öffnet rrd.bin (einmalig), legt sie bei geändertem Layout neu an"""
+    global _fh, _offsets, _acc
+    if _fh:
+        return
+    hdr = _header()
+    try:
+        _fh = open(RRDFILE, "r+b")
+        if _fh.read(len(hdr)) != hdr:
+            raise ValueError("Layout geändert")
+    except Exception:
+        if _fh:
+            _fh.close()
+        print("RRD: lege {} neu an".format(RRDFILE))
+        with open(RRDFILE, "wb") as f:
+            f.write(hdr)
+            block = b"\xff" * (ROW_SIZE * _READ_ROWS)
+            for step, rows in ARCHIVES:
+                left = rows * ROW_SIZE
+                while left > 0:
+                    f.write(block[:min(left, len(block))])
+                    left -= len(block)
+        _fh = open(RRDFILE, "r+b")
+    _offsets = []
+    pos = len(hdr)
+    for step, rows in ARCHIVES:
+        _offsets.append(pos)
+        pos += rows * ROW_SIZE
+    _acc = [None] * len(ARCHIVES)
+
+def _slot_pos(a, bucket):
+    step, rows = ARCHIVES[a]
+    return _offsets[a] + ((bucket // step) % rows) * ROW_SIZE
+
+def _avg(s):
+    return s[2] // s[3] if s[2] >= 0 else -((-s[2]) // s[3])
+
+def _row(acc):
+    """Akkumulator -> Zeilen-Bytes"""
+    vals = []
+    counts = []
+    for s in acc[1]:
+        if s[3]:
+            vals += [s[0], s[1], _avg(s)]
+        else:
+            vals += [NULL_RAW, NULL_RAW, NULL_RAW]
+        counts.append(min(s[3], _MAX_N))
+    return struct.pack(ROW_FMT, acc[0], *(vals + counts))
+
+def _new_acc(a, bucket):
+    """Akkumulator für bucket. Steht der Bucket schon in seinem Slot (vor einem
+    Neustart geschrieben), wird dessen min/max/avg mit Anzahl übernommen."""
+    acc = [bucket, [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]]
+    _fh.seek(_slot_pos(a, bucket))
+    buf = _fh.read(ROW_SIZE)
+    if len(buf) == ROW_SIZE:
+        v = struct.unpack(ROW_FMT, buf)
+        if v[0] == bucket:
+            for i in range(3):
+                mn, mx, avg = v[1 + 3 * i:4 + 3 * i]
+                n = v[10 + i]
+                if avg != NULL_RAW and n:
+                    acc[1][i] = [mn, mx, avg * n, n]
+    return acc
+
+def _write_acc(a):
+    """Schreibt den laufenden Bucket in seinen Slot - außer dort steht schon
+    ein neuerer (Uhr war zurückgesprungen). Liefert True, wenn geschrieben."""
+    acc = _acc[a]
+    pos = _slot_pos(a, acc[0])
+    _fh.seek(pos)
+    buf = _fh.read(4)
+    if len(buf) == 4:
+        ts = struct.unpack("<I", buf)[0]
+        if ts != _EMPTY_TS and ts > acc[0]:
+            return False
+    _fh.seek(pos)
+    _fh.write(_row(acc))
+    return True
+
+def _unpack(buf, off):
+    """Zeilen-Bytes -> (ts, [(min, max, avg) oder None] x 3)"""
+    v = struct.unpack_from(ROW_FMT, buf, off)
+    sensors = []
+    for i in range(3):
+        mn, mx, avg = v[1 + 3 * i:4 + 3 * i]
+        sensors.append(None if avg == NULL_RAW else (mn, mx, avg))
+    return v[0], sensors
+
+# -------------------------------------------------------
+# Öffentliche API
+# -------------------------------------------------------
+
+def add(epoch, r1, r2, r3):
+    """Neuer Messwert (int in 1/16 °C, None = fehlt) - aktualisiert alle Archive.
+    Eine Zeile wird nur beim Wechsel in den nächsten Bucket geschrieben."""
+    with _lock:
+        try:
+            _open()
+            raws = (r1, r2, r3)
+            dirty = False
+            for a in range(len(ARCHIVES)):
+                step = ARCHIVES[a][0]
+                bucket = epoch - epoch % step
+                acc = _acc[a]
+                if acc is None or acc[0] != bucket:
+                    # auch rückwärts (Uhr zurückgesprungen): neuer Bucket,
+                    # der alte bleibt in seinem Slot stehen
+                    if acc is not None and _write_acc(a):
+                        dirty = True
+                    acc = _new_acc(a, bucket)
+                    _acc[a] = acc
+                for i in range(3):
+                    r = raws[i]
+                    if r is None:
+                        continue
+                    s = acc[1][i]
+                    if s[3] == 0 or r < s[0]:
+                        s[0] = r
+                    if s[3] == 0 or r > s[1]:
+                        s[1] = r
+                    s[2] += r
+                    s[3] += 1
+            if dirty:
+                _fh.flush()
+        except Exception as e:
+            print("RRD add error:", e)
+
+def flush():
+    """Laufende (unvollständige) Buckets schreiben, z.B. vor einem Reset.
+    Der Slot wird beim Abschluss des Buckets ohnehin überschrieben."""
+    with _lock:
+        try:
+            if not _fh:
+                return
+            for a in range(len(ARCHIVES)):
+                if _acc[a] is not None:
+                    _write_acc(a)
+            _fh.flush()
+        except Exception as e:
+            print("RRD flush error:", e)
+
+def clear():
+    """Alle Archive verwerfen (Datei wird beim nächsten Zugriff neu angelegt)"""
+    global _fh
+    with _lock:
+        try:
+            if _fh:
+                _fh.close()
+                _fh = None
+            import os
+            os.remove(RRDFILE)
+        except OSError:
+            pass
+
+def pick_archive(t_from, now=None):
+    """Index des feinsten Archivs, das bis t_from zurückreicht.
+    Reicht keins so weit, das gröbste (längste) Archiv."""
+    if now is None:
+        now = int(time.time())
+    for a in range(len(ARCHIVES)):
+        step, rows = ARCHIVES[a]
+        if now - step * (rows - 1) <= t_from:
+            return a
+    return len(ARCHIVES) - 1
+
+def query(t_from, t_to=None, archive=None):
+    """Verdichtete Werte im Zeitraum [t_from, t_to] (Sekunden wie time.time()).
+    Liefert (step, [(ts, [(min, max, avg) oder None] x 3), ...]) zeitlich sortiert,
+    inkl. des laufenden Buckets aus dem RAM."""
+    now = int(time.time())
+    if t_to is None:
+        t_to = now
+    if archive is None:
+        archive = pick_archive(t_from, now)
+    step, rows = ARCHIVES[archive]
+    out = []
+    with _lock:
+        try:
+            _open()
+            first = max(t_from - t_from % step, now - now % step - step * (rows - 1))
+            last = t_to - t_to % step
+            n = min(rows, (last - first) // step + 1) if last >= first else 0
+            slot = (first // step) % rows
+            while n > 0:
+                # zusammenhängende Slots blockweise lesen
+                k = min(n, rows - slot, _READ_ROWS)
+                _fh.seek(_offsets[archive] + slot * ROW_SIZE)
+                buf = _fh.read(k * ROW_SIZE)
+                for i in range(k):
+                    ts, sensors = _unpack(buf, i * ROW_SIZE)
+                    if ts != _EMPTY_TS and first <= ts <= last:
+                        out.append((ts, sensors))
+                n -= k
+                slot = (slot + k) % rows
+            acc = _acc[archive]
+            if acc is not None and first <= acc[0] <= last:
+                ts, sensors = _unpack(_row(acc), 0)
+                if out and out[-1][0] == ts:
+                    out[-1] = (ts, sensors)
+                else:
+                    out.append((ts, sensors))
+        except Exception as e:
+            print("RRD query error:", e)
+    return step, out
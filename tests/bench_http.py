@@ -0,0 +1,82 @@
+# bench_http.py - Lasttest über Loopback: main.py mit Fake-Hardware als
+# eigener Prozess, mehrere Clients gleichzeitig, Requests/s mit und ohne
+# Keep-Alive.
+#
+#   python tests/bench_http.py [sekunden je lauf] [clients]
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import host  # noqa: E402
+
+PATHS = ("/api/temps", "/api/status", "/api/log?limit=20")
+
+
+def _client(port, keep, until, counts, errors, idx):
+    n = 0
+    s = None
+    req = "GET {} HTTP/1.1\r\nHost: x\r\n{}\r\n"
+    try:
+        while time.monotonic() < until:
+            if s is None:
+                s = socket.create_connection(("127.0.0.1", port), timeout=5)
+            path = PATHS[n % len(PATHS)]
+            s.sendall(req.format(path, "" if keep else "Connection: close\r\n").encode())
+            head, _, _ = host.read_response(s)
+            if not head.startswith("HTTP/1.1 200"):
+                errors[idx] += 1
+            n += 1
+            if not keep or host.header(head, "Connection") == "close":
+                s.close()
+                s = None
+    except OSError:
+        errors[idx] += 1
+    finally:
+        if s:
+            s.close()
+    counts[idx] = n
+
+
+def _run(port, keep, seconds, clients):
+    counts = [0] * clients
+    errors = [0] * clients
+    until = time.monotonic() + seconds
+    threads = [threading.Thread(target=_client, args=(port, keep, until, counts, errors, i)) for i in range(clients)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+    print("  {:14s} {:7.0f} Requests/s  ({} Requests, {} Fehler, {} Clients)".format(
+        "Keep-Alive:" if keep else "ohne Keep-Alive:", sum(counts) / elapsed, sum(counts), sum(errors), clients))
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    work = tempfile.mkdtemp()
+    port = host.free_port()
+    proc = host.start_main(work, port, {"measure_interval_s": 1})
+    try:
+        if not host.wait_ready(port):
+            print("Webserver nicht erreichbar")
+            return
+        print("Loopback-Lasttest (CPython-asyncio, Fake-Sensoren), Pfade: {}".format(", ".join(PATHS)))
+        _run(port, False, seconds, clients)
+        _run(port, True, seconds, clients)
+    finally:
+        out = host.stop_main(proc)
+        shutil.rmtree(work)
+    if "Traceback" in out:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench_logger.py - Host-Benchmark des Log-Formats (log.ring) auf dem
+# ausgelieferten log.csv: Kompressionsrate und Kodier-/Dekodieraufwand.
+#
+#   python tests/bench_logger.py [log.csv] [wiederholungen]
+#
+# Läuft in einem Temp-Verzeichnis; das angegebene log.csv bleibt unverändert.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TESTS)
+sys.path[:0] = [os.path.join(TESTS, "fakes"), ROOT]
+
+import mpy_time  # noqa: E402,F401
+import logger  # noqa: E402
+
+
+def _rows(path):
+    with open(path) as f:
+        return [l.rstrip("\n") for l in f if l[:1].isdigit()]
+
+
+def _fresh(capacity):
+    if logger._fh:
+        logger._fh.close()
+        logger._fh = None
+    for name in (logger.RINGFILE, logger.LOGFILE, logger.LOGFILE + ".bak"):
+        if os.path.exists(name):
+            os.remove(name)
+    logger.configure(capacity, 10 ** 6, 10 ** 6)
+
+
+def _bench(recs, csv_bytes, label):
+    _fresh(len(recs) + 1000)
+    t0 = time.perf_counter()
+    with logger._lock:
+        for rec in recs:
+            logger._add(rec)
+        t1 = time.perf_counter()
+        logger._flush()
+        t2 = time.perf_counter()
+        decoded = list(logger._scan())
+        t3 = time.perf_counter()
+    assert decoded == recs, "Dekodierung weicht ab"
+    used = (logger._used - 1) * logger.BLOCK_SIZE + logger._blk_used
+    n = len(recs)
+    print("{}: {} Einträge".format(label, n))
+    print("  CSV-Text:      {:8d} Byte  {:6.2f} Byte/Eintrag".format(csv_bytes, csv_bytes / n))
+    print("  10-Byte-Record:{:8d} Byte  {:6.2f} Byte/Eintrag".format(10 * n, 10.0))
+    print("  log.ring:      {:8d} Byte  {:6.2f} Byte/Eintrag  ({:.2f} Byte je Messwert)".format(
+        used, used / n, used / (3 * n)))
+    print("  Kompression:   {:.1f}x gegenüber CSV, {:.1f}x gegenüber 10-Byte-Records".format(
+        csv_bytes / used, 10 * n / used))
+    print("  Kodieren:      {:7.1f} µs/Eintrag (+ Flush {:.1f} ms)".format(
+        (t1 - t0) / n * 1e6, (t2 - t1) * 1e3))
+    print("  Dekodieren:    {:7.1f} µs/Eintrag".format((t3 - t2) / n * 1e6))
+    print("  (Zeiten: CPython auf dem Host, nicht auf dem ESP32-C3 gemessen)")
+
+
+def main():
+    src = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, "log.csv"))
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rows = _rows(src)
+    work = tempfile.mkdtemp()
+    os.chdir(work)
+    try:
+        recs = [r for r in (logger._parse_line(l) for l in rows) if r]
+        csv_bytes = sum(len(l) + 1 for l in rows)
+        _bench(recs, csv_bytes, os.path.basename(src))
+        print()
+        # gleiche Werte, zeitlich fortgesetzt: zeigt den Dauerbetrieb (volle Blöcke)
+        step = 60
+        long_recs = []
+        t = recs[0][0]
+        for _ in range(repeat):
+            for rec in recs:
+                long_recs.append((t,) + rec[1:])
+                t += step
+        _bench(long_recs, csv_bytes * repeat, "{} x {} (fortlaufende Zeit)".format(os.path.basename(src), repeat))
+    finally:
+        if logger._fh:
+            logger._fh.close()
+            logger._fh = None
+        os.chdir(ROOT)
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# conftest.py - Host-Tests: Hardware-Attrappen (tests/fakes) und Repo auf den Pfad
+#
+# Jeder Test läuft in einem eigenen Temp-Verzeichnis, weil logger/rrd/assets
+# ihre Dateien (log.ring, rrd.bin, *.gz, ...) relativ zum Arbeitsverzeichnis
+# anlegen - wie auf dem Gerät.
+
+import importlib
+import os
+import sys
+
+import pytest
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TESTS)
+FAKES = os.path.join(TESTS, "fakes")
+
+for p in (ROOT, FAKES):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import mpy_time  # noqa: E402,F401  (time.ticks_ms & Co. für CPython)
+
+
+@pytest.fixture(autouse=True)
+def _tmp_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+
+
+@pytest.fixture
+def buses():
+    """Sensoren je GPIO für den Fake-Bus; nach dem Test wieder leer"""
+    import onewire
+    onewire.OneWire.BUSES = {}
+    yield onewire.OneWire.BUSES
+    onewire.OneWire.BUSES = {}
+
+
+@pytest.fixture
+def reopen():
+    """reopen(capacity) simuliert einen Neustart: logger neu laden (Modulzustand
+    weg) und log.ring im Test-Verzeichnis öffnen"""
+    import logger
+
+    def _reopen(capacity=2000):
+        if logger._fh:
+            logger._fh.close()
+        importlib.reload(logger)
+        logger.configure(capacity, 1000, 3600)
+        return logger
+
+    yield _reopen
+    if logger._fh:
+        logger._fh.close()
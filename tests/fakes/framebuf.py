@@ -0,0 +1,8 @@
+# framebuf.py - Host-Attrappe (nur für Tests), ssd1306 wird ohne I2C nie benutzt
+
+MONO_VLSB = 0
+
+
+class FrameBuffer:
+    def __init__(self, *args):
+        pass
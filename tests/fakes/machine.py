@@ -0,0 +1,32 @@
+# machine.py - Host-Attrappe (nur für Tests): Pins ohne Hardware, kein I2C/OLED
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+    IRQ_FALLING = 4
+
+    def __init__(self, n, *args, **kwargs):
+        self.n = n
+        self.v = 0
+
+    def value(self, v=None):
+        if v is None:
+            return self.v
+        self.v = v
+
+    def irq(self, **kwargs):
+        pass
+
+
+class I2C:
+    def __init__(self, *args, **kwargs):
+        raise OSError("no i2c")
+
+
+def unique_id():
+    return b"\x01\x02\x03\x04"
+
+
+def reset():
+    raise SystemExit("machine.reset")
@@ -0,0 +1,14 @@
+# mpy_time.py - MicroPython-Zeitfunktionen für CPython (nur für Tests)
+#
+# time.ticks_ms/ticks_diff/sleep_ms gibt es nur unter MicroPython; logger.py,
+# measurement.py und der Treiber benutzen sie direkt.
+
+import time
+
+if not hasattr(time, "ticks_ms"):
+    time.ticks_ms = lambda: int(time.monotonic() * 1000)
+    time.ticks_us = lambda: int(time.monotonic() * 1000000)
+    time.ticks_diff = lambda a, b: a - b
+    time.ticks_add = lambda a, b: a + b
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
@@ -0,0 +1,17 @@
+# network.py - Host-Attrappe (nur für Tests): Access Point ohne Funk
+
+AP_IF = 1
+
+
+class WLAN:
+    def __init__(self, *args):
+        pass
+
+    def active(self, *args):
+        return True
+
+    def config(self, **kwargs):
+        pass
+
+    def ifconfig(self):
+        return ("192.168.4.1", "255.255.255.0", "192.168.4.1", "192.168.4.1")
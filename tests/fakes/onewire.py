@@ -0,0 +1,133 @@
+# onewire.py - Host-Attrappe des MicroPython-Moduls onewire (nur für Tests)
+#
+# Die Sensoren je GPIO stehen in OneWire.BUSES, bevor der Treiber den Bus
+# öffnet. Ein FakeSensor bildet das Verhalten ab, auf das sich der Treiber
+# verlässt: flüchtiges Scratchpad mit Auflösung, EEPROM (COPY SCRATCHPAD),
+# Power-On-Wert 85 °C und eine Wandlungszeit abhängig von der Auflösung.
+# Gestörte Lesevorgänge: Scratchpads in FakeSensor.inject werden vor den
+# echten geliefert (kaputte CRC, 85 °C, -127 °C, lauter Nullen, ...).
+
+import time
+
+CONV_MS = {0x1F: 94, 0x3F: 188, 0x5F: 375, 0x7F: 750}
+
+class FakeSensor:
+    def __init__(self, rom, t=20.0, config=0x7F):
+        self.rom = bytes(rom)
+        self.t = t                       # aktuelle Temperatur in °C
+        self.eeprom = [0, 0, config]     # TH, TL, Konfiguration (überlebt Power-Cycle)
+        self.scratch = list(self.eeprom)
+        self.raw = 0x0550                # letzte Wandlung (85 °C = Power-On)
+        self._pending = None             # (fertig_um, raw) der laufenden Wandlung
+        self.scratch_writes = 0
+        self.scratch_reads = 0
+        self.eeprom_writes = 0
+        self.inject = []                 # nächste Scratchpads (9 Byte), vor den echten
+
+    def power_cycle(self):
+        self.scratch = list(self.eeprom)
+        self.raw = 0x0550
+        self._pending = None
+
+    def resolution(self):
+        return 9 + (self.scratch[2] >> 5)
+
+    def conv_ms(self):
+        # echte Sensoren sind schneller als das Datenblatt-Maximum
+        return CONV_MS[self.scratch[2]] * 0.8
+
+    def convert(self, now):
+        raw = int(round(self.t * 16)) & ~((1 << (12 - self.resolution())) - 1)
+        self._pending = (now + self.conv_ms() / 1000, raw)
+
+    def busy(self, now):
+        if self._pending and now >= self._pending[0]:
+            self.raw = self._pending[1]
+            self._pending = None
+        return self._pending is not None
+
+    def make_scratchpad(self, raw, crc_ok=True):
+        """Scratchpad mit Temperatur raw (1/16 °C); crc_ok=False -> CRC-Fehler"""
+        raw &= 0xFFFF
+        buf = bytearray([raw & 0xFF, raw >> 8, self.scratch[0], self.scratch[1],
+                         self.scratch[2], 0xFF, 0x0C, 0x10, 0])
+        buf[8] = crc8(buf[:8]) ^ (0 if crc_ok else 0x5A)
+        return buf
+
+    def scratchpad(self):
+        self.busy(time.monotonic())
+        self.scratch_reads += 1
+        if self.inject:
+            return bytearray(self.inject.pop(0))
+        return self.make_scratchpad(self.raw)
+
+
+def crc8(data):
+    crc = 0
+    for b in data:
+        for _ in range(8):
+            mix = (crc ^ b) & 1
+            crc >>= 1
+            if mix:
+                crc ^= 0x8C
+            b >>= 1
+    return crc
+
+
+class OneWire:
+    SEARCH_ROM = 0xF0
+    MATCH_ROM = 0x55
+    SKIP_ROM = 0xCC
+
+    BUSES = {}  # GPIO -> [FakeSensor, ...]
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.devices = OneWire.BUSES.setdefault(pin.n, [])
+        self.selected = None     # None = alle (SKIP ROM)
+        self.conversions = 0     # gestartete Wandlungen (convert_temp)
+
+    def device(self, rom):
+        rom = bytes(rom)
+        for d in self.devices:
+            if d.rom == rom:
+                return d
+        return None
+
+    def reset(self, required=False):
+        self.selected = None
+        if required and not self.devices:
+            raise OSError("no 1-wire device")
+        return bool(self.devices)
+
+    def readbit(self):
+        # Extern versorgte Sensoren halten den Bus während der Wandlung auf 0.
+        # Eine echte Suche (ALARM SEARCH) wird nicht nachgebildet: 1/1 = niemand.
+        now = time.monotonic()
+        return 0 if any(d.busy(now) for d in self.devices) else 1
+
+    def readbyte(self):
+        return 0xFF
+
+    def writebit(self, value):
+        pass
+
+    def write(self, buf):
+        pass
+
+    def writebyte(self, value):
+        if value == 0x48:   # COPY SCRATCHPAD
+            for d in self.devices:
+                if self.selected is None or d.rom == self.selected:
+                    d.eeprom = list(d.scratch)
+                    d.eeprom_writes += 1
+
+    def select_rom(self, rom):
+        self.reset()
+        self.selected = bytes(rom)
+
+    def scan(self):
+        return [bytearray(d.rom) for d in self.devices]
+
+    def crc8(self, data):
+        return crc8(data)
@@ -0,0 +1,2 @@
+# ubinascii.py - MicroPython-Name für binascii (nur für Tests)
+from binascii import *
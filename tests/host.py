@@ -0,0 +1,115 @@
+# host.py - Hilfen für Host-Tests und -Benchmarks: main.py mit Fake-Hardware
+# als eigener Prozess, einfacher HTTP-Client über rohe Sockets
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TESTS)
+FAKES = os.path.join(TESTS, "fakes")
+
+BOOT = """
+import sys
+sys.path[:0] = [{fakes!r}, {root!r}]
+import mpy_time, onewire, webserver
+onewire.OneWire.BUSES = {{
+    0: [onewire.FakeSensor(b"\\x28\\x00" + bytes(6), 17.25)],
+    1: [onewire.FakeSensor(b"\\x28\\x01" + bytes(6), 18.5)],
+    2: [],
+}}
+webserver.PORT = {port}
+{extra}
+import main
+"""
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def start_main(cwd, port, cfg=None, extra=""):
+    """main.py im Verzeichnis cwd starten (config.json = cfg, falls angegeben).
+    extra läuft im Prozess direkt vor import main, z.B. um die Fake-Busse zu ändern."""
+    if cfg is not None:
+        with open(os.path.join(cwd, "config.json"), "w") as f:
+            json.dump(cfg, f)
+    return subprocess.Popen([sys.executable, "-u", "-c", BOOT.format(fakes=FAKES, root=ROOT, port=port, extra=extra)],
+                            cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+
+def stop_main(proc):
+    """Prozess beenden, Ausgabe zurückgeben"""
+    proc.terminate()
+    return proc.communicate(timeout=10)[0].decode(errors="replace")
+
+
+def read_response(sock):
+    """Eine Antwort mit Content-Length bzw. bis zum Verbindungsende lesen:
+    (Kopf, Body, Byte auf der Leitung)"""
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    head = head.decode()
+    length = None
+    for line in head.split("\r\n")[1:]:
+        k, _, v = line.partition(":")
+        if k.strip().lower() == "content-length":
+            length = int(v)
+    while length is None or len(body) < length:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        body += chunk
+    return head, body, len(head) + 4 + len(body)
+
+
+def get(port, path, headers=None):
+    """GET mit Connection: close -> (Kopf, Body, Byte auf der Leitung)"""
+    s = socket.create_connection(("127.0.0.1", port), timeout=5)
+    extra = "".join("{}: {}\r\n".format(k, v) for k, v in (headers or {}).items())
+    s.sendall("GET {} HTTP/1.1\r\nHost: x\r\n{}Connection: close\r\n\r\n".format(path, extra).encode())
+    try:
+        return read_response(s)
+    finally:
+        s.close()
+
+
+def header(head, name):
+    for line in head.split("\r\n")[1:]:
+        k, _, v = line.partition(":")
+        if k.strip().lower() == name.lower():
+            return v.strip()
+    return None
+
+
+def wait_for(cond, timeout):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            result = cond()
+            if result:
+                return result
+        except OSError:
+            pass
+        time.sleep(0.1)
+    return None
+
+
+def wait_ready(port, timeout=15):
+    """Wartet, bis der Webserver den ersten Messwert ausliefert"""
+    def measured():
+        head, body, _ = get(port, "/api/temps")
+        return head.startswith("HTTP/1.1 200") and any(t is not None for t in json.loads(body)["temps"])
+    return wait_for(measured, timeout)
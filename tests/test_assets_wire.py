@@ -0,0 +1,44 @@
+# test_assets_wire.py - Byte auf der Leitung für das Dashboard: Klartext vs.
+# gzip aus dem Flash vs. Wiederbesuch mit ETag (304)
+
+import gzip
+
+import host
+
+
+def test_dashboard_bytes_on_the_wire(tmp_path):
+    port = host.free_port()
+    proc = host.start_main(str(tmp_path), port, {"measure_interval_s": 1})
+    try:
+        assert host.wait_ready(port)
+        plain = {}
+        packed = {}
+        for path in ("/", "/app.js"):
+            plain[path] = host.get(port, path)
+            packed[path] = host.get(port, path, {"Accept-Encoding": "gzip, deflate"})
+        head, body, _ = packed["/"]
+        etag = host.header(head, "ETag")
+
+        # Wiederbesuch: app.js ist "immutable" (kein Request), / kommt als 304
+        revisit = host.get(port, "/", {"Accept-Encoding": "gzip", "If-None-Match": etag})
+    finally:
+        out = host.stop_main(proc)
+    assert "Traceback" not in out, out
+
+    for path in plain:
+        p_head, p_body, _ = plain[path]
+        g_head, g_body, _ = packed[path]
+        assert host.header(p_head, "Content-Encoding") is None
+        assert host.header(g_head, "Content-Encoding") == "gzip"
+        assert gzip.decompress(g_body) == p_body
+        assert host.header(g_head, "ETag") == host.header(p_head, "ETag")
+    assert "immutable" in host.header(packed["/app.js"][0], "Cache-Control")
+    assert host.header(packed["/"][0], "Cache-Control") == "no-cache"
+
+    raw = sum(r[2] for r in plain.values())
+    first = sum(r[2] for r in packed.values())
+    again = revisit[2]
+    print("\nDashboard auf der Leitung: Klartext {} B, gzip {} B, Wiederbesuch {} B".format(raw, first, again))
+    assert revisit[0].startswith("HTTP/1.1 304") and revisit[1] == b""
+    assert first < raw * 0.4
+    assert again < 300
@@ -0,0 +1,91 @@
+# test_channels.py - Multi-Drop-Kanalzuordnung (bus_mode "single") in main.py
+
+import json
+import os
+
+import host
+
+ROM_A = "2800000000000000"
+
+# vier Fühler an GPIO 0: A/B/C gespeichert + ein Reserve-Fühler ohne Kanal.
+# Solange die Datei "unplug" existiert, fehlt der Fühler von Kanal A am Bus.
+HOTPLUG = """
+import os, threading, time
+_bus = onewire.OneWire.BUSES[0]
+_bus += [onewire.FakeSensor(bytes([0x28, i]) + bytes(6), 20.0 + i) for i in (1, 2, 3)]
+_a = _bus[0]
+def _plug():
+    while True:
+        time.sleep(0.05)
+        if os.path.exists("unplug") == (_a in _bus):
+            if _a in _bus:
+                _bus.remove(_a)
+            else:
+                _bus.insert(0, _a)
+threading.Thread(target=_plug, daemon=True).start()
+"""
+
+
+def _boot(tmp_path, cfg):
+    port = host.free_port()
+    proc = host.start_main(str(tmp_path), port, cfg)
+    try:
+        assert host.wait_ready(port)
+        head, body, _ = host.get(port, "/api/temps")
+    finally:
+        out = host.stop_main(proc)
+    assert "Traceback" not in out, out
+    with open(str(tmp_path / "config.json")) as f:
+        return json.loads(body)["temps"][:3], json.load(f)["sensors"], out
+
+
+def _temps(port):
+    head, body, _ = host.get(port, "/api/temps")
+    return json.loads(body)["temps"][:3]
+
+
+def _roms(tmp_path):
+    with open(str(tmp_path / "config.json")) as f:
+        return {k: v.get("rom") for k, v in json.load(f)["sensors"].items()}
+
+
+def test_missing_stored_rom_leaves_channel_empty(tmp_path):
+    # gespeicherter Fühler von Kanal A fehlt: kein freier Sensor rückt nach
+    temps, sensors, out = _boot(tmp_path, {"bus_mode": "single", "bus_pin": 0, "measure_interval_s": 1,
+                                           "sensors": {"A": {"rom": "28FF000000000000"}}})
+    assert temps == [None, 17.25, None]
+    assert sensors["A"]["rom"] == "28FF000000000000"
+    assert sensors["B"]["rom"] == ROM_A
+    assert "Kanal A: 28FF000000000000 fehlt" in out
+
+
+def test_present_stored_rom_keeps_its_channel(tmp_path):
+    temps, sensors, _ = _boot(tmp_path, {"bus_mode": "single", "bus_pin": 0, "measure_interval_s": 1,
+                                         "sensors": {"B": {"rom": ROM_A}}})
+    assert temps == [None, 17.25, None]
+    assert sensors["B"]["rom"] == ROM_A
+    assert "A" not in sensors or sensors["A"]["rom"] == ""
+
+
+def test_rescan_dropout_keeps_channel_off_the_spare(tmp_path):
+    cfg = {"bus_mode": "single", "bus_pin": 0, "measure_interval_s": 1, "rescan_interval_s": 1,
+           "sensors": {"A": {"rom": ROM_A}, "B": {"rom": "2801000000000000"},
+                       "C": {"rom": "2802000000000000"}}}
+    port = host.free_port()
+    proc = host.start_main(str(tmp_path), port, cfg, extra=HOTPLUG)
+    try:
+        assert host.wait_for(lambda: _temps(port) == [17.25, 21.0, 22.0], 15)
+        roms = _roms(tmp_path)
+
+        open(str(tmp_path / "unplug"), "w").close()
+        assert host.wait_for(lambda: _temps(port)[0] is None, 15)
+        assert _temps(port)[1:] == [21.0, 22.0]
+        assert _roms(tmp_path) == roms            # nichts auf den Reserve-Fühler umgeschrieben
+
+        os.remove(str(tmp_path / "unplug"))
+        assert host.wait_for(lambda: _temps(port) == [17.25, 21.0, 22.0], 15)
+        assert _roms(tmp_path) == roms
+    finally:
+        out = host.stop_main(proc)
+    assert "Traceback" not in out, out
+    assert "Kanal A: {} fehlt".format(ROM_A) in out
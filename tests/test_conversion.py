@@ -0,0 +1,77 @@
+# test_conversion.py - Zykluszeit der geteilten Wandlung (start_conversion /
+# collect) über mehrere Busse, gegen den Fake-Bus
+
+import asyncio
+import time
+
+import onewire
+from Klasse_DS18x20 import DS18x20
+from measurement import MeasurementService
+
+CONV_S = onewire.CONV_MS[0x7F] * 0.8 / 1000     # eine 12-bit-Wandlung des Fakes
+
+
+def _sensor(i, t):
+    return onewire.FakeSensor(b"\x28" + bytes([i]) + bytes(6), t)
+
+
+def _pins(buses):
+    for pin in range(3):
+        buses[pin] = [_sensor(pin, 17.0 + pin)]
+    sensors = [DS18x20(pin=p, resolution=12, name="Sensor_" + "ABC"[p]) for p in range(3)]
+    for s in sensors:
+        assert s.init()
+    return sensors
+
+
+def _service(channels):
+    return MeasurementService(channels, ["A", "B", "C"], {"sensors": {}, "median_window": 1})
+
+
+def test_three_buses_cost_one_conversion(buses):
+    sensors = _pins(buses)
+    svc = _service([(s, 0) for s in sensors])
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+
+    async def cycle():
+        t = asyncio.ensure_future(ticker())
+        start = time.monotonic()
+        temps = await svc.measure()
+        elapsed = time.monotonic() - start
+        t.cancel()
+        return temps, elapsed
+
+    temps, elapsed = asyncio.run(cycle())
+    assert temps == [17.0, 18.0, 19.0]
+    assert CONV_S <= elapsed < 1.5 * CONV_S, elapsed
+    assert [s.ow.conversions for s in sensors] == [1, 1, 1]
+    assert all(s.conv_timeouts == 0 for s in sensors)
+    # der Eventloop lief während der Wandlung weiter (kein blockierendes sleep)
+    assert len(ticks) >= CONV_S / 0.01 * 0.5
+
+
+def test_sequential_reads_cost_three_conversions(buses):
+    # Gegenprobe: der alte Ablauf read() je Bus wartet dreimal
+    sensors = _pins(buses)
+    start = time.monotonic()
+    assert [s.read() for s in sensors] == [[17.0], [18.0], [19.0]]
+    assert time.monotonic() - start >= 3 * CONV_S
+
+
+def test_single_bus_many_probes_one_conversion(buses):
+    buses[0] = [_sensor(i, 15.0 + i / 16) for i in range(12)]
+    bus = DS18x20(pin=0, resolution=12, name="Bus")
+    assert bus.init()
+    svc = _service([(bus, 0), (bus, 5), (bus, 11)])
+    start = time.monotonic()
+    temps = asyncio.run(svc.measure())
+    elapsed = time.monotonic() - start
+    assert temps == [15.0, 15.3125, 15.6875]
+    assert bus.ow.conversions == 1
+    assert elapsed < 1.5 * CONV_S
+    assert all(d.scratch_reads == 1 + 1 for d in buses[0])   # Boot-Prüfung + ein Zyklus
@@ -0,0 +1,113 @@
+# test_ds18x20.py - Treiber gegen den Fake-Bus: Auflösung nach Power-Cycle,
+# CRC-Wiederholungen, Sentinel-Werte; Median-/Sprungfilter der Messung
+
+import onewire
+from Klasse_DS18x20 import DS18x20
+from measurement import MedianFilter
+
+ROMS = [b"\x28" + bytes([i]) + bytes(6) for i in range(3)]
+
+
+def _bus(buses, config=0x7F):
+    buses[0] = [onewire.FakeSensor(rom, 20.0 + i, config) for i, rom in enumerate(ROMS)]
+    return buses[0]
+
+
+def _boot(known=None, resolution=9):
+    d = DS18x20(pin=0, resolution=resolution, name="Bus")
+    assert d.init(known)
+    return d
+
+
+def test_known_roms_restore_resolution_after_power_cycle(buses):
+    devs = _bus(buses)
+    known = _boot().table_entry()
+    assert [d.resolution() for d in devs] == [9, 9, 9]
+
+    for d in devs:
+        d.power_cycle()                 # Scratchpad wieder aus dem EEPROM: 12 bit
+    assert [d.resolution() for d in devs] == [12, 12, 12]
+
+    bus = _boot(known)
+    assert [d.resolution() for d in devs] == [9, 9, 9]
+    assert bus.start_conversion() == 94
+    assert bus.collect() == [20.0, 21.0, 22.0]
+    assert bus.conv_timeouts == 0
+
+
+def test_known_roms_without_change_only_read(buses):
+    devs = _bus(buses)
+    known = _boot().table_entry()
+    writes = [d.scratch_writes for d in devs]
+    reads = [d.scratch_reads for d in devs]
+
+    _boot(known)                        # Reset ohne Power-Cycle: nichts zu schreiben
+    assert [d.scratch_writes for d in devs] == writes
+    assert [d.scratch_reads - r for d, r in zip(devs, reads)] == [1, 1, 1]
+
+
+def test_adaptive_resolution_left_in_scratchpad_is_reset(buses):
+    devs = _bus(buses)
+    known = _boot(resolution=12).table_entry()
+    assert sum(d.scratch_writes for d in devs) == 0    # 12 bit ist Werkseinstellung
+    devs[1].scratch[2] = 0x1F           # adaptiv auf 9 bit, dann Reset ohne Power-Cycle
+
+    bus = _boot(known, resolution=12)
+    assert [d.resolution() for d in devs] == [12, 12, 12]
+    assert [d.scratch_writes for d in devs] == [0, 1, 0]
+    bus.start_conversion()
+    assert bus.collect() == [20.0, 21.0, 22.0]
+
+
+def test_read_raw_retries_crc_errors(buses):
+    devs = _bus(buses)
+    bus = _boot(resolution=12)
+    d = devs[1]
+    d.inject = [d.make_scratchpad(336, crc_ok=False)] * 2      # 2x gestört, dann gut
+    bus.start_conversion()
+    assert bus.collect() == [20.0, 21.0, 22.0]
+    assert (bus.crc_errors, bus.read_retries) == (2, 2)
+
+    d.inject = [d.make_scratchpad(336, crc_ok=False)] * (bus.retries + 1)
+    bus.start_conversion()
+    assert bus.collect() == [20.0, None, 22.0]               # Wiederholungen erschöpft
+    assert (bus.crc_errors, bus.read_retries) == (5, 4)
+    assert bus.read_stats()["crc_errors"] == 5
+
+
+def test_read_raw_rejects_sentinels(buses):
+    devs = _bus(buses)
+    bus = _boot(resolution=12)
+    d = devs[0]
+    for buf in (d.make_scratchpad(0x0550),       # 85 °C: Power-On, keine Wandlung
+                d.make_scratchpad(-2032),        # -127 °C: getrennt
+                bytearray(9)):                   # lauter Nullen (CRC 0 passt!)
+        d.inject = [buf]
+        bus.start_conversion()
+        assert bus.collect(raw=True) == [None, 336, 352]
+    assert bus.sentinels == 3
+    assert bus.crc_errors == 0
+
+    d.inject = [d.make_scratchpad(-2000)]         # -125 °C ist ein gültiger Wert
+    bus.start_conversion()
+    assert bus.collect(raw=True) == [-2000, 336, 352]
+
+
+def test_median_filter_median_and_max_jump():
+    f = MedianFilter(window=3)
+    assert [f.update(x) for x in (320, 330, 900, 325, 326)] == [320, 330, 330, 330, 326]
+
+    f = MedianFilter(window=5)
+    assert [f.update(x) for x in (1, 2, 3, 4, 5, 100, 100)] == [1, 2, 3, 4, 3, 4, 5]
+
+    f = MedianFilter(window=3, max_jump=16)      # 1 °C in 1/16 °C
+    assert [f.update(x) for x in (320, 322, 500, 324)] == [320, 322, 322, 322]
+    assert f.outliers == 1                       # Ausreißer verworfen, Fenster unverändert
+    # echter Sprung: bestätigt sich über ein ganzes Fenster
+    assert [f.update(x) for x in (480, 480, 480)] == [322, 322, 480]
+    assert f.outliers == 3
+    assert f.update(490) == 490 and f.update(485) == 485
+
+    # fehlende Messungen: letzter Wert wird window-1 Mal gehalten, dann None
+    assert [f.update(None) for _ in range(3)] == [485, 485, None]
+    assert f.update(300) == 300                  # nach der Lücke keine Sprung-Sperre
@@ -0,0 +1,82 @@
+# test_http.py - HTTP-Parser des Webservers: Frist je Request (Slow-Loris)
+
+import asyncio
+import time
+
+import webserver
+
+
+def _run(client, timeout_s=0.5):
+    """handle_client auf einem freien Port, client(port) als Coroutine"""
+    async def main():
+        saved = webserver.REQUEST_TIMEOUT_S
+        webserver.REQUEST_TIMEOUT_S = timeout_s
+        server = await asyncio.start_server(webserver.handle_client, "127.0.0.1", 0)
+        try:
+            return await client(server.sockets[0].getsockname()[1])
+        finally:
+            webserver.REQUEST_TIMEOUT_S = saved
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(main())
+
+
+async def _closed_after(reader, limit_s):
+    """Sekunden bis der Server die Verbindung schließt (None = noch offen)"""
+    start = time.monotonic()
+    try:
+        data = await asyncio.wait_for(reader.read(), limit_s)
+    except asyncio.TimeoutError:
+        return None, b""
+    return time.monotonic() - start, data
+
+
+def test_trickling_client_is_cut_off_at_request_deadline():
+    async def client(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        start = time.monotonic()
+        closed = asyncio.ensure_future(_closed_after(reader, 5))
+        # jedes Byte kommt weit innerhalb der Frist - in Summe aber nie fertig
+        writer.write(b"GET /api/config HTTP/1.1\r\n")
+        for _ in range(40):
+            if closed.done():
+                break
+            try:
+                writer.write(b"X")
+                await writer.drain()
+            except (ConnectionError, OSError):
+                break
+            await asyncio.sleep(0.1)
+        t, _ = await closed
+        writer.close()
+        return t is not None and time.monotonic() - start
+
+    elapsed = _run(client, 0.5)
+    assert elapsed and elapsed < 1.5, elapsed
+
+
+def test_split_request_within_deadline_is_served():
+    async def client(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for part in (b"GET /api/con", b"fig HTTP/1.1\r\nHost: x\r\n", b"Connection: close\r\n\r\n"):
+            writer.write(part)
+            await writer.drain()
+            await asyncio.sleep(0.1)
+        data = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return data
+
+    assert _run(client, 1).startswith(b"HTTP/1.1 200 OK")
+
+
+def test_idle_keepalive_wait_is_not_cut_by_request_deadline():
+    async def client(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await asyncio.sleep(0.8)         # länger als die Request-Frist, kürzer als IDLE_TIMEOUT_S
+        writer.write(b"GET /api/config HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return data
+
+    assert _run(client, 0.5).startswith(b"HTTP/1.1 200 OK")
@@ -0,0 +1,50 @@
+# test_legacy_import.py - Übernahme des ausgelieferten log.csv
+
+import os
+import shutil
+
+from conftest import ROOT
+from fixpoint import fmt_raw, from_raw, to_raw
+
+
+def _export(log):
+    """wie der Download /api/log.csv: Puffer nach jedem Schritt weitergeben"""
+    buf = bytearray(1024)
+    out = b""
+    for n in log.csv_chunks(buf):
+        out += bytes(buf[:n])
+    return out.decode()
+
+
+def test_shipped_log_is_kept_and_exported_unchanged_where_representable(reopen):
+    shutil.copy(os.path.join(ROOT, "log.csv"), "log.csv")
+    original = open("log.csv", "rb").read()
+    log = reopen()
+
+    assert not os.path.exists("log.csv")
+    assert open("log.csv.bak", "rb").read() == original      # nichts geht verloren
+
+    src = original.decode().splitlines()
+    out = _export(log).splitlines()
+    assert out[0] == src[0] == "Zeit,Sensor A,Sensor B,Sensor C"
+    assert len(out) == len(src)
+    for a, b in zip(src[1:], out[1:]):
+        va, vb = a.split(","), b.split(",")
+        assert va[0] == vb[0]
+        for x, y in zip(va[1:], vb[1:]):
+            # 1/16-°C-Werte bleiben zeichengleich, alte Offset-Werte (z.B. 17.313)
+            # landen auf dem nächsten 1/16 °C
+            assert y == fmt_raw(to_raw(float(x)))
+            assert abs(float(x) - float(y)) <= 1 / 32
+
+    # zweiter Start: log.csv.bak wird nicht noch einmal übernommen
+    log = reopen()
+    assert _export(log).splitlines() == out
+
+
+def test_rounded_offset_display_matches_log():
+    # so rechnet main.load_config(): Offset einmalig auf 1/16 °C
+    offset = from_raw(to_raw(0.563))
+    assert offset == 0.5625
+    shown = 20.5 + offset                        # float-Pfad des Messdienstes
+    assert "{:.3f}".format(shown) == fmt_raw(to_raw(shown)) == "21.062"
@@ -0,0 +1,72 @@
+# test_logger_downsample.py - Min/Max-Bucketing über Uhrensprünge hinweg
+
+import os
+import random
+import shutil
+
+from conftest import ROOT
+
+T0 = 946684800
+
+
+def _brute(recs, t_from, t_to, points):
+    """Referenz: gleiche Buckets, aber über alle Einträge ohne Suche"""
+    nb = max(1, points // 2)
+    width = (t_to - t_from) // nb + 1
+    out = []
+    for s in range(3):
+        lo, hi = {}, {}
+        for r in recs:
+            if not t_from <= r[0] <= t_to or r[1 + s] is None:
+                continue
+            b = (r[0] - t_from) // width
+            if b not in lo or r[1 + s] < lo[b][1]:
+                lo[b] = (r[0], r[1 + s])
+            if b not in hi or r[1 + s] > hi[b][1]:
+                hi[b] = (r[0], r[1 + s])
+        out.append(sorted(set(lo.values()) | set(hi.values())))
+    return out
+
+
+def _assert_same(got, want):
+    # bei gleichem Min/Max-Wert darf ein anderer Zeitpunkt gewählt werden
+    for g, w in zip(got, want):
+        assert sorted(v for _, v in g) == sorted(v for _, v in w)
+        assert [t for t, _ in g] == sorted(t for t, _ in g)
+
+
+def test_shipped_log_defaults_cover_both_boots(reopen):
+    shutil.copy(os.path.join(ROOT, "log.csv"), "log.csv")
+    rows = [l for l in open("log.csv") if l[0].isdigit()]
+    log = reopen(2000)
+    recs = [log._parse_line(r) for r in rows]
+    pts = log.downsample(points=400)
+    t_min, t_max = min(r[0] for r in recs), max(r[0] for r in recs)
+    reset = recs[-2][0]                             # 00:00:06 nach dem Neustart
+    assert any(t < recs[0][0] for t, _ in pts[0])   # Punkte nach dem Neustart
+    assert t_min == reset
+    _assert_same(pts, _brute(recs, t_min, t_max, 400))
+
+
+def test_random_clock_jumps_match_brute_force(reopen):
+    rng = random.Random(17)
+    log = reopen(600)
+    recs = []
+    t = T0
+    for i in range(3000):
+        if rng.random() < 0.01:
+            t = T0 + rng.randrange(0, 7200)
+        else:
+            t += 60
+        rec = (t, rng.randrange(200, 400), None if i % 9 == 0 else rng.randrange(0, 50), -16)
+        log._append(rec)
+        recs.append(rec)
+    with log._lock:
+        kept = list(log._scan())
+    for _ in range(50):
+        a = T0 + rng.randrange(0, 20000)
+        b = a + rng.randrange(60, 20000)
+        points = rng.choice((2, 10, 50, 200))
+        _assert_same(log.downsample(a, b, points), _brute(kept, a, b, points))
+    t_min, t_max = min(r[0] for r in kept), max(r[0] for r in kept)
+    _assert_same(log.downsample(points=100), _brute(kept, t_min, t_max, 100))
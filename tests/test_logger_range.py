@@ -0,0 +1,107 @@
+# test_logger_range.py - Zeitfenster-Suche über log.ring: binäre Suche je
+# zeitlich geordnetem Abschnitt, auch über Uhrensprünge (Boot ohne RTC)
+
+import math
+import os
+import random
+import shutil
+
+from conftest import ROOT
+
+T0 = 946684800          # 2000-01-01 00:00:00 (Uhr ohne RTC nach jedem Boot)
+
+
+def _brute(recs, t_from, t_to):
+    return [r for r in recs if t_from <= r[0] <= t_to]
+
+
+class _Counter:
+    """Zählt Header-Reads (_block_ts) und dekodierte Blöcke (_block)"""
+
+    def __init__(self, log):
+        self.log = log
+        self.ts = self.blocks = 0
+        self._ts, self._block = log._block_ts, log._block
+        log._block_ts = self.count_ts
+        log._block = self.count_block
+
+    def count_ts(self, j):
+        self.ts += 1
+        return self._ts(j)
+
+    def count_block(self, j):
+        self.blocks += 1
+        return self._block(j)
+
+    def restore(self):
+        self.log._block_ts, self.log._block = self._ts, self._block
+
+
+def test_50k_records_logarithmic_seek(reopen):
+    log = reopen(50000)
+    recs = []
+    for i in range(50000):
+        rec = (T0 + 86400 * 365 + 60 * i, 320 + (i % 11) - 5, 300 + (i % 3), None if i % 97 == 0 else 280)
+        log._append(rec)
+        recs.append(rec)
+    assert log.stats()["entries"] == 50000
+    blocks = log._used
+    rng = random.Random(16)
+    for _ in range(40):
+        a = rng.randrange(50000)
+        b = min(49999, a + rng.randrange(1, 200))
+        t_from, t_to = recs[a][0], recs[b][0] + 30
+        c = _Counter(log)
+        try:
+            lines, total = log.get_log_range(t_from, t_to, limit=1000)
+        finally:
+            c.restore()
+        want = _brute(recs, t_from, t_to)
+        assert total == len(want)
+        assert lines == [log.format_record(r) for r in want]
+        # Einstieg O(log Blöcke), dekodiert wird nur das Fenster (+ Randblöcke)
+        assert c.ts <= math.ceil(math.log2(blocks)) + 2, (c.ts, blocks)
+        per_block = 50000 / blocks
+        assert c.blocks <= len(want) / per_block + 3, (c.blocks, len(want))
+
+
+def test_shipped_log_with_clock_reset(reopen):
+    shutil.copy(os.path.join(ROOT, "log.csv"), "log.csv")
+    rows = [l.strip() for l in open("log.csv") if l[0].isdigit()]
+    log = reopen(2000)
+    day = log._parse_line(rows[0])[0] - (17 * 3600 + 27 * 60)   # 2000-01-01 00:00:00 lokal
+    lines, total = log.get_log_range(day, day + 300)
+    assert total == 2
+    assert [l[:19] for l in lines] == ["2000-01-01 00:00:06", "2000-01-01 00:01:08"]
+    # Abschnitt vor dem Neustart bleibt ebenso erreichbar
+    lines, total = log.get_log_range(day + 17 * 3600 + 27 * 60, day + 17 * 3600 + 30 * 60)
+    assert [l[:19] for l in lines] == [r[:19] for r in rows[:3]] and total == 3
+
+
+def test_random_clock_jumps_match_brute_force(reopen):
+    rng = random.Random(7)
+    log = reopen(600)                 # 24 Blöcke, läuft mehrfach um
+    recs = []
+    t = T0
+    for i in range(4000):
+        if rng.random() < 0.01:
+            t = T0 + rng.randrange(0, 7200)          # Neustart: Uhr zurück
+        else:
+            t += rng.choice((59, 60, 60, 61, 120))
+        rec = (t, rng.randrange(200, 400), None, rng.randrange(-50, 50))
+        log._append(rec)
+        recs.append(rec)
+    for restart in (False, True):
+        if restart:
+            log.flush()
+            log = reopen(600)          # Abschnitte kommen aus den Block-Flags
+        with log._lock:
+            kept = list(log._scan())
+        assert kept == recs[-len(kept):]
+        for _ in range(200):
+            a = T0 + rng.randrange(0, 30000)
+            b = a + rng.randrange(0, 3000)
+            lines, total = log.get_log_range(a, b, limit=10 ** 6)
+            want = _brute(kept, a, b)
+            assert total == len(want)
+            assert lines == [log.format_record(r) for r in want]
@@ -0,0 +1,154 @@
+# test_logger_recovery.py - Fehlerinjektion: abgeschnittene / abgerissene log.ring
+
+import os
+import random
+
+import pytest
+
+import logger
+
+CAPACITY = 300          # 12 Blöcke
+T0 = 946684800          # 2000-01-01 00:00:00
+
+
+def _fill(n, start=0):
+    recs = []
+    for i in range(start, start + n):
+        rec = (T0 + 60 * i, 272 + (i % 7) - 3, None if i % 50 == 0 else 300 - (i % 5), 256 + i % 3)
+        logger._append(rec)
+        recs.append(rec)
+    return recs
+
+
+def _records():
+    with logger._lock:
+        return list(logger._scan())
+
+
+def _is_subsequence(part, whole):
+    it = iter(whole)
+    return all(any(r == w for w in it) for r in part)
+
+
+@pytest.fixture
+def full_log(reopen):
+    reopen(CAPACITY)
+    recs = _fill(1500)          # mehrfach umgelaufen
+    logger.flush()
+    kept = _records()
+    assert kept == recs[-len(kept):]
+    data = open(logger.RINGFILE, "rb").read()
+    return kept, data
+
+
+def test_random_truncation_keeps_complete_blocks(full_log, reopen):
+    kept, data = full_log
+    rng = random.Random(20)
+    bs, hs = logger.BLOCK_SIZE, logger._HDR_SIZE
+    for _ in range(300):
+        cut = rng.randrange(hs, len(data))
+        with open(logger.RINGFILE, "wb") as f:
+            f.write(data[:cut])
+        reopen(CAPACITY)
+        got = _records()
+        assert os.path.getsize(logger.RINGFILE) == len(data), "Datei nicht ergänzt"
+        assert not os.path.exists(logger.RINGFILE + ".bad")
+        assert _is_subsequence(got, kept)
+        # alle Blöcke, die vollständig vor dem Schnitt liegen, bleiben lesbar
+        complete = 0
+        for p in range((cut - hs) // bs):
+            complete += len(logger.decode_block(data[hs + p * bs:hs + (p + 1) * bs]))
+        assert len(got) >= complete, (cut, len(got), complete)
+        assert logger.stats()["entries"] == len(got)
+        # und es geht danach normal weiter
+        more = _fill(3, 2000)
+        assert _records()[-3:] == more
+
+
+def test_torn_append_drops_only_the_tail(full_log, reopen):
+    kept, data = full_log
+    reopen(CAPACITY)
+    base = logger._HDR_SIZE + logger._head * logger.BLOCK_SIZE
+    used = logger._blk_used
+    rng = random.Random(5)
+    for _ in range(50):
+        torn = bytearray(data)
+        # Ausfall während eines Anhängens: ein paar Byte Müll hinter dem letzten Eintrag
+        n = rng.randrange(1, 8)
+        for i in range(n):
+            if used + i < logger._SEAL_POS:
+                torn[base + used + i] = rng.randrange(256)
+        with open(logger.RINGFILE, "wb") as f:
+            f.write(torn)
+        reopen(CAPACITY)
+        got = _records()
+        assert _is_subsequence(got, kept)
+        assert len(got) >= len(kept) - 1    # höchstens der abgerissene Eintrag fehlt
+        assert got[:len(kept) - 1] == kept[:len(got)][:len(kept) - 1]
+
+
+def test_unreadable_file_is_kept_as_bad(full_log, reopen):
+    kept, data = full_log
+    with open(logger.RINGFILE, "r+b") as f:
+        f.write(b"XXXX")
+    reopen(CAPACITY)
+    assert _records() == []
+    assert open(logger.RINGFILE + ".bad", "rb").read() == b"XXXX" + data[4:]
+
+
+def test_interrupted_resize_keeps_old_log(full_log, reopen):
+    kept, data = full_log
+
+    def crash(src, dst):
+        raise OSError("Stromausfall")
+
+    replace = logger._replace
+    logger._replace = crash
+    logger._fh.close()
+    logger._fh = None
+    logger.CAPACITY = 600
+    try:
+        with pytest.raises(OSError):
+            logger._open()
+    finally:
+        logger._replace = replace
+    assert open(logger.RINGFILE, "rb").read() == data
+    reopen(CAPACITY)
+    assert _records() == kept
+
+
+def _resize(capacity):
+    """Kapazität ändern wie configure() nach einem Neustart, aber ohne reload
+    (damit die Zählhilfe unten erhalten bleibt)"""
+    logger._fh.close()
+    logger._fh = None
+    logger.CAPACITY = capacity
+    logger._open()
+
+
+def test_resize_streams_blocks(full_log):
+    kept, data = full_log
+    decode = logger.decode_block
+    sizes = []
+
+    def counting(buf):
+        recs = decode(buf)
+        sizes.append(len(recs))
+        return recs
+
+    def no_scan(*args):
+        raise AssertionError("ganzes Log im RAM")
+
+    scan = logger._scan
+    logger.decode_block, logger._scan = counting, no_scan
+    try:
+        _resize(600)                    # 12 -> 24 Blöcke: alles bleibt
+        assert len(sizes) == 12         # Block für Block aus der alten Datei
+        assert sum(sizes) == len(kept)
+        del sizes[:]
+        _resize(100)                    # 24 -> 4 Blöcke: nur die jüngsten alten Blöcke
+        assert len(sizes) == 4
+    finally:
+        logger.decode_block, logger._scan = decode, scan
+    got = _records()
+    assert 0 < len(got) < len(kept) and got == kept[-len(got):]
@@ -0,0 +1,30 @@
+# test_save_reset.py - /api/save: gepufferte Log-Einträge überleben den Reset
+
+import re
+import socket
+
+import host
+
+
+def test_save_flushes_log_right_before_reset(tmp_path, reopen):
+    port = host.free_port()
+    # Flush-Regel so, dass ohne explizites flush() nichts geschrieben würde
+    proc = host.start_main(str(tmp_path), port, {"measure_interval_s": 1, "log_flush_records": 1000,
+                                                 "log_flush_interval_s": 3600})
+    try:
+        assert host.wait_ready(port)
+        s = socket.create_connection(("127.0.0.1", port), timeout=5)
+        s.sendall(b"POST /api/save HTTP/1.1\r\nHost: x\r\nContent-Length: 2\r\n\r\n{}")
+        head, body, _ = host.read_response(s)
+        s.close()
+        assert head.startswith("HTTP/1.1 200") and b"ok" in body
+        out = proc.communicate(timeout=10)[0].decode(errors="replace")   # machine.reset() beendet den Prozess
+    finally:
+        if proc.poll() is None:
+            host.stop_main(proc)
+    assert "machine.reset" in out, out
+    measured = len(re.findall(r"^\[\d+\] A:", out, re.M))
+    assert measured >= 2          # auch während der 2 s vor dem Reset wurde gemessen
+
+    log = reopen(2000)
+    assert log.stats()["entries"] == measured
@@ -0,0 +1,30 @@
+# test_smoke.py - kompletter Stack auf dem Host: main.py mit Fake-Hardware im
+# eigenen Prozess, Webserver auf einem freien Port.
+
+import json
+import os
+
+import host
+
+
+def test_main_serves_measurements(tmp_path):
+    # Offset 0.563 wird beim Laden auf 0.5625 (9/16 °C) gerundet
+    port = host.free_port()
+    proc = host.start_main(str(tmp_path), port, {"measure_interval_s": 1, "sensors": {"A": {"offset": 0.563}}})
+    try:
+        assert host.wait_ready(port), "kein Messwert vom Webserver"
+        head, body, _ = host.get(port, "/api/temps")
+        assert json.loads(body)["temps"][:3] == [17.8125, 18.5, None]
+
+        head, body, _ = host.get(port, "/")
+        assert head.startswith("HTTP/1.1 200")
+        assert b"-THERMO-" in body or b"<html" in body.lower()
+
+        head, body, _ = host.get(port, "/api/log")
+        assert head.startswith("HTTP/1.1 200")
+        # Dashboard und Log zeigen denselben Wert
+        assert json.loads(body)["log"][0].split(",")[1:] == ["17.812", "18.500", ""]
+        assert os.path.exists(str(tmp_path / "log.ring"))
+    finally:
+        out = host.stop_main(proc)
+    assert "Traceback" not in out, out
@@ -0,0 +1,68 @@
+# test_stream.py - /api/stream (SSE) gegen main.py mit Fake-Sensoren
+
+import json
+import socket
+import time
+
+import host
+
+
+def _open_stream(port):
+    s = socket.create_connection(("127.0.0.1", port), timeout=5)
+    s.sendall(b"GET /api/stream?log=5 HTTP/1.1\r\nHost: x\r\n\r\n")
+    return s
+
+
+def _events(s, count, timeout=10):
+    """Liest bis count 'temps'-Events da sind -> (Kopf, [(event, data), ...])"""
+    data = b""
+    end = time.monotonic() + timeout
+    while data.count(b"event: temps") < count and time.monotonic() < end:
+        chunk = s.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    head, _, body = data.partition(b"\r\n\r\n")
+    events = []
+    for block in body.decode().split("\n\n"):
+        lines = dict(l.split(": ", 1) for l in block.split("\n") if l.startswith(("event: ", "data: ")))
+        if "event" in lines:
+            events.append((lines["event"], json.loads(lines["data"])))
+    return head.decode(), events
+
+
+def test_stream_events_limit_and_slot_release(tmp_path):
+    port = host.free_port()
+    # Messintervall deutlich länger als die Wartezeit nach dem Trennen unten
+    proc = host.start_main(str(tmp_path), port, {"measure_interval_s": 3})
+    streams = []
+    try:
+        assert host.wait_ready(port)
+        streams.append(_open_stream(port))
+        head, events = _events(streams[0], 2)
+        assert head.startswith("HTTP/1.1 200") and "text/event-stream" in head
+        temps = [d for e, d in events if e == "temps"]
+        assert len(temps) >= 2                           # ein Event je Messung
+        assert len({d["seq"] for d in temps}) == len(temps)
+        assert temps[-1]["temps"][:2] == [17.25, 18.5]
+        assert events[0] == ("temps", temps[0]) and events[1][0] == "log" and events[1][1]["init"]
+
+        for _ in range(2):
+            streams.append(_open_stream(port))
+            assert _events(streams[-1], 1)[0].startswith("HTTP/1.1 200")
+        s = _open_stream(port)                           # MAX_STREAMS = 3
+        head, body, _ = host.read_response(s)
+        s.close()
+        assert head.startswith("HTTP/1.1 503")
+
+        # Tab geschlossen: der Slot wird sofort frei, nicht erst nach STREAM_PING_S
+        streams.pop(0).close()
+        time.sleep(0.5)
+        streams.append(_open_stream(port))
+        assert _events(streams[-1], 1)[0].startswith("HTTP/1.1 200")
+    finally:
+        for s in streams:
+            s.close()
+        out = host.stop_main(proc)
+    assert "Traceback" not in out, out
+
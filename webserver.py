@@ -1,17 +1,44 @@
 # webserver.py - AP + Dashboard + CSV-Download (VERSION 1.5 - Trigger + ROM-ID + Offset)
 
 import network
-import socket
 import json
 import time
+import gc
 import logger
+import history
+import rrd
+import assets
+from fixpoint import from_raw
 import sys  # Für machine.reset
 
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
 # Globale Variablen für Webserver-Handler
 cfg_global = {}
-get_temps_global = None
+get_snapshot_global = None  # Messdienst: liefert (seq, zeitstempel_s, ticks_ms, temps)
+get_stats_global = None     # Messdienst: Status-/Latenz-Daten
+wait_snapshot_global = None # Messdienst: wartet auf neuen Snapshot (SSE)
 save_cb_global = None
-rom_info_global = []  # Sensor ROM Informationen (Familie + Serial)
+rom_info_global = []  # SensorInfo je Kanal (Familie, Serial, ROM-String) oder None
+
+PORT = 80          # HTTP-Port (Host-Tests setzen einen freien Port)
+SEND_CHUNK = 1024  # Sendepuffer je CSV-Download bzw. Asset (Byte pro Chunk)
+
+# HTTP-Grenzen (Requests darüber werden mit 431/413 abgewiesen)
+MAX_HEADER = 2048           # Request-Zeile + Header in Byte
+MAX_BODY = 4096             # Body in Byte (/api/save)
+READ_CHUNK = 512            # Byte je Socket-Read
+REQUEST_TIMEOUT_S = 5       # ein begonnener Request muss insgesamt so schnell vollständig sein
+IDLE_TIMEOUT_S = 10         # Keep-Alive: Verbindung ohne neuen Request schließen
+MAX_KEEPALIVE_REQUESTS = 100
+
+# Server-Sent Events (/api/stream)
+MAX_STREAMS = 3             # gleichzeitige Streams, weitere Clients pollen (503)
+STREAM_PING_S = 15          # Kommentarzeile ohne neue Messung (hält die Verbindung offen)
+_streams = 0
 
 html_template = """
 <!DOCTYPE html>
@@ -95,6 +122,40 @@ html_template = """
                 <input type="number" id="measure_interval_s" min="1" max="86400" value="2">
             </div>
 
+            <div class="form-group">
+                <label>Log-Kapazität (Einträge):</label>
+                <input type="number" id="log_capacity" min="10" max="50000" value="2000">
+            </div>
+
+            <div class="form-group">
+                <label>Bus-Modus:</label>
+                <select id="bus_mode">
+                    <option value="pins">Je Sensor ein GPIO (0/1/2)</option>
+                    <option value="single">Ein Bus für alle Sensoren (Multi-Drop)</option>
+                </select>
+            </div>
+
+            <div class="form-group">
+                <label>GPIO gemeinsamer Bus:</label>
+                <input type="number" id="bus_pin" min="0" max="21" value="0">
+            </div>
+
+            <div class="form-group">
+                <label>Hardware-Alarm (Trigger als TH/TL im Sensor, ALARM SEARCH):</label>
+                <select id="alarm_search">
+                    <option value="0">Aus</option>
+                    <option value="1">Ein</option>
+                </select>
+            </div>
+
+            <div class="form-group">
+                <label>Adaptive Auflösung (9-bit fern der Trigger):</label>
+                <select id="adaptive_resolution">
+                    <option value="0">Aus</option>
+                    <option value="1">Ein</option>
+                </select>
+            </div>
+
             <h3>Sensor A/B/C Trigger & Kalibrierung</h3>
             <div id="sensor-config"></div>
 
@@ -121,219 +182,317 @@ html_template = """
         </div>
     </div>
 
-    <script>
-        const CONFIG_URL = '/api/config';
-        const TEMPS_URL  = '/api/temps';
-        const LOG_URL    = '/api/log';
-        const SAVE_URL   = '/api/save';
-        const CLEAR_URL  = '/api/clear';
-
-        let currentCfg = null;
-
-        function buildSensorConfig(cfg) {
-            const container = document.getElementById('sensor-config');
-            container.innerHTML = '';
-            const labels = ['A','B','C'];
-            labels.forEach(label => {
-                const sc = (cfg.sensors && cfg.sensors[label]) || {};
-                const enabled = sc.enabled !== false;
-                const low  = sc.low_trigger  != null ? sc.low_trigger  : 18.0;
-                const high = sc.high_trigger != null ? sc.high_trigger : 25.0;
-                const invert = sc.invert_logic === true;
-                const offset = sc.offset != null ? sc.offset : 0.0;
-
-                const row = document.createElement('div');
-                row.className = 'sensor-row';
-                row.innerHTML = `
-                    <span>${label}</span>
-                    <label><input type="checkbox" id="en_${label}" ${enabled ? 'checked' : ''}> Aktiv</label>
-                    <input type="number" id="low_${label}" step="0.1" value="${low}" placeholder="Low">
-                    <input type="number" id="high_${label}" step="0.1" value="${high}" placeholder="High">
-                    <input type="number" id="offset_${label}" step="0.1" value="${offset}" placeholder="Offset">
-                    <label><input type="checkbox" id="inv_${label}" ${invert ? 'checked' : ''}> Invert</label>
-                `;
-                container.appendChild(row);
-            });
-        }
-
-        async function loadConfig() {
-            try {
-                const resp = await fetch(CONFIG_URL);
-                const cfg = await resp.json();
-                currentCfg = cfg;
-
-                document.getElementById('resolution').value = cfg.resolution || 12;
-                document.getElementById('ap_ssid').value = cfg.ap_ssid || '';
-                document.getElementById('ap_password').value = cfg.ap_password || '';
-                document.getElementById('display_timeout_s').value = cfg.display_timeout_s || 60;
-                document.getElementById('measure_interval_s').value = cfg.measure_interval_s || 2;
-
-                buildSensorConfig(cfg);
-            } catch (e) {
-                console.error('Load config error:', e);
-            }
-        }
-
-        async function saveConfig() {
-            const cfg = currentCfg || {};
-            cfg.resolution = parseInt(document.getElementById('resolution').value);
-            cfg.ap_ssid = document.getElementById('ap_ssid').value;
-            cfg.ap_password = document.getElementById('ap_password').value;
-            cfg.display_timeout_s = parseInt(document.getElementById('display_timeout_s').value) || 0;
-            cfg.measure_interval_s = parseInt(document.getElementById('measure_interval_s').value) || 2;
-            if (cfg.measure_interval_s < 1) cfg.measure_interval_s = 1;
-            if (cfg.measure_interval_s > 86400) cfg.measure_interval_s = 86400;
-
-            cfg.sensors = cfg.sensors || {};
-            ['A','B','C'].forEach(label => {
-                cfg.sensors[label] = {
-                    enabled: document.getElementById('en_' + label).checked,
-                    low_trigger: parseFloat(document.getElementById('low_' + label).value),
-                    high_trigger: parseFloat(document.getElementById('high_' + label).value),
-                    offset: parseFloat(document.getElementById('offset_' + label).value) || 0.0,
-                    invert_logic: document.getElementById('inv_' + label).checked
-                };
-            });
-
-            try {
-                await fetch(SAVE_URL, {
-                    method: 'POST',
-                    body: JSON.stringify(cfg)
-                });
-                alert('Konfiguration gespeichert – THERMO startet neu... - WLAN verbinden');
-                setTimeout(() => location.reload(), 2000);
-            } catch (e) {
-                alert('Fehler beim Speichern: ' + e);
-            }
-        }
-
-        function getStatusClass(t, st) {
-            if (st === 'off' || st === 'none' || t === null) {
-                return 'sensor-card state-off';
-            } else if (st === 'low') {
-                return 'sensor-card state-low';
-            } else if (st === 'high') {
-                return 'sensor-card state-high';
-            } else {
-                return 'sensor-card state-normal';
-            }
-        }
+    <script src="/app.js?v=__APP_JS__"></script>
+</body>
+</html>
+"""
 
-        async function loadTemps() {
-            try {
-                const resp = await fetch(TEMPS_URL);
-                const data = await resp.json();
-                const grid = document.getElementById('sensor-grid');
-                grid.innerHTML = '';
-                data.labels.forEach((label, idx) => {
-                    const t = data.temps[idx];
-                    const st = data.status[idx];
-                    const family = data.rom_family ? data.rom_family[idx] : '--';
-                    const serial = data.rom_serial ? data.rom_serial[idx] : '--';
-
-                    let text = '--';
-                    if (t !== null) {
-                        text = t.toFixed(3) + ' °C';
-                    }
-
-                    // Vollständige ROM-Adresse mit Trennzeichen: Family-Serial-CRC
-                    let displayRom = serial;
-                    if (serial.length === 16) {
-                        displayRom = serial.slice(0,2) + '-' + serial.slice(2,14) + '-' + serial.slice(14,16);
-                    } else if (serial !== '--') {
-                        displayRom = serial;
-                    }
-
-                    const card = document.createElement('div');
-                    card.className = getStatusClass(t, st);
-                    card.innerHTML = `
-                        <div class="sensor-title">Sensor ${label}</div>
-                        <div class="sensor-temp">${text}</div>
-                        <div style="font-size: 12px; margin-top: 4px;">Status: ${st}</div>
-                        <div class="sensor-meta">Family: ${family}<br/>ROM: ${displayRom}</div>
-                    `;
-                    grid.appendChild(card);
-                });
-            } catch (e) {
-                console.error('Load temps error:', e);
-            }
+# Dashboard-Skript als eigenes Asset (separat cachebar, URL mit ETag versioniert)
+js_template = """
+const CONFIG_URL = '/api/config';
+const TEMPS_URL  = '/api/temps';
+const LOG_ROWS   = 20;
+const LOG_URL    = '/api/log?limit=' + LOG_ROWS;
+const SAVE_URL   = '/api/save';
+const CLEAR_URL  = '/api/clear';
+const STREAM_URL = '/api/stream?log=' + LOG_ROWS;
+
+let currentCfg = null;
+let logLines = [];
+let pollTimer = null;
+
+function buildSensorConfig(cfg) {
+    const container = document.getElementById('sensor-config');
+    container.innerHTML = '';
+    const labels = ['A','B','C'];
+    labels.forEach(label => {
+        const sc = (cfg.sensors && cfg.sensors[label]) || {};
+        const enabled = sc.enabled !== false;
+        const low  = sc.low_trigger  != null ? sc.low_trigger  : 18.0;
+        const high = sc.high_trigger != null ? sc.high_trigger : 25.0;
+        const invert = sc.invert_logic === true;
+        const offset = sc.offset != null ? sc.offset : 0.0;
+
+        const row = document.createElement('div');
+        row.className = 'sensor-row';
+        row.innerHTML = `
+            <span>${label}</span>
+            <label><input type="checkbox" id="en_${label}" ${enabled ? 'checked' : ''}> Aktiv</label>
+            <input type="number" id="low_${label}" step="0.1" value="${low}" placeholder="Low">
+            <input type="number" id="high_${label}" step="0.1" value="${high}" placeholder="High">
+            <input type="number" id="offset_${label}" step="0.0625" value="${offset}" placeholder="Offset">
+            <label><input type="checkbox" id="inv_${label}" ${invert ? 'checked' : ''}> Invert</label>
+        `;
+        container.appendChild(row);
+    });
+}
+
+async function loadConfig() {
+    try {
+        const resp = await fetch(CONFIG_URL);
+        const cfg = await resp.json();
+        currentCfg = cfg;
+
+        document.getElementById('resolution').value = cfg.resolution || 12;
+        document.getElementById('ap_ssid').value = cfg.ap_ssid || '';
+        document.getElementById('ap_password').value = cfg.ap_password || '';
+        document.getElementById('display_timeout_s').value = cfg.display_timeout_s || 60;
+        document.getElementById('measure_interval_s').value = cfg.measure_interval_s || 2;
+        document.getElementById('log_capacity').value = cfg.log_capacity || 2000;
+        document.getElementById('bus_mode').value = cfg.bus_mode || 'pins';
+        document.getElementById('bus_pin').value = cfg.bus_pin != null ? cfg.bus_pin : 0;
+        document.getElementById('alarm_search').value = cfg.alarm_search ? '1' : '0';
+        document.getElementById('adaptive_resolution').value = cfg.adaptive_resolution ? '1' : '0';
+
+        buildSensorConfig(cfg);
+    } catch (e) {
+        console.error('Load config error:', e);
+    }
+}
+
+async function saveConfig() {
+    const cfg = currentCfg || {};
+    cfg.resolution = parseInt(document.getElementById('resolution').value);
+    cfg.ap_ssid = document.getElementById('ap_ssid').value;
+    cfg.ap_password = document.getElementById('ap_password').value;
+    cfg.display_timeout_s = parseInt(document.getElementById('display_timeout_s').value) || 0;
+    cfg.measure_interval_s = parseInt(document.getElementById('measure_interval_s').value) || 2;
+    if (cfg.measure_interval_s < 1) cfg.measure_interval_s = 1;
+    if (cfg.measure_interval_s > 86400) cfg.measure_interval_s = 86400;
+    cfg.log_capacity = parseInt(document.getElementById('log_capacity').value) || 2000;
+    cfg.bus_mode = document.getElementById('bus_mode').value;
+    cfg.bus_pin = parseInt(document.getElementById('bus_pin').value) || 0;
+    cfg.alarm_search = document.getElementById('alarm_search').value === '1';
+    cfg.adaptive_resolution = document.getElementById('adaptive_resolution').value === '1';
+
+    cfg.sensors = cfg.sensors || {};
+    ['A','B','C'].forEach(label => {
+        // Bestehende Felder (z.B. ROM-Zuordnung) behalten
+        cfg.sensors[label] = Object.assign(cfg.sensors[label] || {}, {
+            enabled: document.getElementById('en_' + label).checked,
+            low_trigger: parseFloat(document.getElementById('low_' + label).value),
+            high_trigger: parseFloat(document.getElementById('high_' + label).value),
+            offset: parseFloat(document.getElementById('offset_' + label).value) || 0.0,
+            invert_logic: document.getElementById('inv_' + label).checked
+        });
+    });
+
+    try {
+        await fetch(SAVE_URL, {
+            method: 'POST',
+            body: JSON.stringify(cfg)
+        });
+        alert('Konfiguration gespeichert – THERMO startet neu... - WLAN verbinden');
+        setTimeout(() => location.reload(), 2000);
+    } catch (e) {
+        alert('Fehler beim Speichern: ' + e);
+    }
+}
+
+function getStatusClass(t, st) {
+    if (st === 'off' || st === 'none' || t === null) {
+        return 'sensor-card state-off';
+    } else if (st === 'low') {
+        return 'sensor-card state-low';
+    } else if (st === 'high') {
+        return 'sensor-card state-high';
+    } else {
+        return 'sensor-card state-normal';
+    }
+}
+
+async function loadTemps() {
+    try {
+        const resp = await fetch(TEMPS_URL);
+        renderTemps(await resp.json());
+    } catch (e) {
+        console.error('Load temps error:', e);
+    }
+}
+
+function renderTemps(data) {
+    const grid = document.getElementById('sensor-grid');
+    grid.innerHTML = '';
+    data.labels.forEach((label, idx) => {
+        const t = data.temps[idx];
+        const st = data.status[idx];
+        const family = data.rom_family ? data.rom_family[idx] : '--';
+        const serial = data.rom_serial ? data.rom_serial[idx] : '--';
+        const romId = data.rom_id ? data.rom_id[idx] : null;
+
+        let text = '--';
+        if (t !== null) {
+            text = t.toFixed(3) + ' °C';
         }
-
-        async function loadLog() {
-            try {
-                const resp = await fetch(LOG_URL);
-                const data = await resp.json();
-                const body = document.getElementById('log-body');
-                let html = '';
-                data.log.slice(-20).forEach(line => {
-                    const parts = line.split(',');
-                    if (parts.length >= 4) {
-                        html += `
-                            <tr>
-                                <td>${parts[0]}</td>
-                                <td>${parts[1] || '--'}</td>
-                                <td>${parts[2] || '--'}</td>
-                                <td>${parts[3] || '--'}</td>
-                            </tr>
-                        `;
-                    }
-                });
-                body.innerHTML = html || '<tr><td colspan="4">Keine Daten</td></tr>';
-            } catch (e) {
-                console.error('Load log error:', e);
-            }
+        const tr = data.trend ? data.trend[idx] : null;
+        let trendText = '';
+        if (tr !== null && tr !== undefined) {
+            trendText = (tr > 0 ? '↑ +' : (tr < 0 ? '↓ ' : '→ ')) + tr.toFixed(3) + ' °C';
         }
 
-        async function clearLog() {
-            if (!confirm('Wirklich alle Log-Einträge löschen?')) return;
-            try {
-                await fetch(CLEAR_URL, {method: 'POST'});
-                loadLog();
-            } catch (e) {
-                alert('Fehler: ' + e);
-            }
+        // Vollständige ROM-Adresse mit Trennzeichen: Family-Serial-CRC
+        let displayRom = serial;
+        if (romId) {
+            displayRom = romId;
+        } else if (serial.length === 16) {
+            displayRom = serial.slice(0,2) + '-' + serial.slice(2,14) + '-' + serial.slice(14,16);
+        } else if (serial !== '--') {
+            displayRom = serial;
         }
 
-        async function downloadCsv() {
-            try {
-                const resp = await fetch('/api/log.csv');
-                const text = await resp.text();
-                const blob = new Blob([text], { type: 'text/csv' });
-                const url = URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = 'thermo-log.csv';
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                URL.revokeObjectURL(url);
-            } catch (e) {
-                alert('Fehler beim CSV-Download: ' + e);
-            }
+        const card = document.createElement('div');
+        card.className = getStatusClass(t, st);
+        card.innerHTML = `
+            <div class="sensor-title">Sensor ${label}</div>
+            <div class="sensor-temp">${text}</div>
+            <div style="font-size: 12px;">${trendText}</div>
+            <div style="font-size: 12px; margin-top: 4px;">Status: ${st}</div>
+            <div class="sensor-meta">Family: ${family}<br/>ROM: ${displayRom}</div>
+        `;
+        grid.appendChild(card);
+    });
+}
+
+async function loadLog() {
+    try {
+        const resp = await fetch(LOG_URL);
+        const data = await resp.json();
+        logLines = data.log.slice(-LOG_ROWS);
+        renderLog();
+    } catch (e) {
+        console.error('Load log error:', e);
+    }
+}
+
+function renderLog() {
+    const body = document.getElementById('log-body');
+    let html = '';
+    logLines.forEach(line => {
+        const parts = line.split(',');
+        if (parts.length >= 4) {
+            html += `
+                <tr>
+                    <td>${parts[0]}</td>
+                    <td>${parts[1] || '--'}</td>
+                    <td>${parts[2] || '--'}</td>
+                    <td>${parts[3] || '--'}</td>
+                </tr>
+            `;
         }
-
-        // Initial laden
-        loadConfig();
+    });
+    body.innerHTML = html || '<tr><td colspan="4">Keine Daten</td></tr>';
+}
+
+// Live-Updates per Server-Sent Events; ohne EventSource oder bei 503
+// (zu viele Streams) wird wie bisher alle 5 Sekunden gepollt und der Stream
+// mit wachsendem Abstand (5 s .. 60 s) erneut versucht
+let streamDelay = 5000;
+
+function startPolling() {
+    if (pollTimer) return;
+    loadTemps();
+    loadLog();
+    pollTimer = setInterval(() => {
         loadTemps();
         loadLog();
-        
-        // Alle 5 Sekunden aktualisieren
-        setInterval(() => {
-            loadTemps();
-            loadLog();
-        }, 5000);
-    </script>
-</body>
-</html>
+    }, 5000);
+}
+
+function stopPolling() {
+    if (!pollTimer) return;
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+function startStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const es = new EventSource(STREAM_URL);
+    es.onopen = () => {
+        streamDelay = 5000;
+        stopPolling();
+    };
+    es.addEventListener('temps', e => renderTemps(JSON.parse(e.data)));
+    es.addEventListener('log', e => {
+        const data = JSON.parse(e.data);
+        logLines = (data.init ? data.log : logLines.concat(data.log)).slice(-LOG_ROWS);
+        renderLog();
+    });
+    es.onerror = () => {
+        // Verbindungsabbruch: EventSource verbindet selbst neu; abgewiesen
+        // (503) oder aufgegeben -> bis zum nächsten Versuch pollen
+        if (es.readyState !== EventSource.CLOSED) return;
+        es.close();
+        startPolling();
+        setTimeout(startStream, streamDelay);
+        streamDelay = Math.min(streamDelay * 2, 60000);
+    };
+}
+
+async function clearLog() {
+    if (!confirm('Wirklich alle Log-Einträge löschen?')) return;
+    try {
+        await fetch(CLEAR_URL, {method: 'POST'});
+        loadLog();
+    } catch (e) {
+        alert('Fehler: ' + e);
+    }
+}
+
+async function downloadCsv() {
+    try {
+        const resp = await fetch('/api/log.csv');
+        const text = await resp.text();
+        const blob = new Blob([text], { type: 'text/csv' });
+        const url = URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = 'thermo-log.csv';
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
+        URL.revokeObjectURL(url);
+    } catch (e) {
+        alert('Fehler beim CSV-Download: ' + e);
+    }
+}
+
+// Initial laden
+loadConfig();
+startStream();
 """
 
-def build_temps_payload():
-    """Erstellt Temps + Status + ROM-Info für Dashboard - VERSION 1.5"""
-    temps = get_temps_global()
+def parse_query(path):
+    """Trennt Pfad und Query-String: '/api/temps?max_age=5' -> ('/api/temps', {'max_age': '5'})"""
+    if "?" not in path:
+        return path, {}
+    path, qs = path.split("?", 1)
+    params = {}
+    for part in qs.split("&"):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            params[k] = v
+        elif part:
+            params[part] = ""
+    return path, params
+
+async def build_temps_payload(max_age=None):
+    """Erstellt Temps + Status + ROM-Info für Dashboard - VERSION 1.5
+    Liest nur den Snapshot des Messdienstes; max_age (s) erzwingt eine neue
+    Messung nur, wenn der Snapshot älter ist."""
+    seq, ts, ticks, temps = await get_snapshot_global(max_age)
+    if cfg_global.get("fixed_point"):
+        # Festkomma (1/16 °C) erst hier, am JSON-Rand, in °C umrechnen
+        temps = [from_raw(t) for t in temps]
     labels = ["A", "B", "C"]
+    # Änderung über die letzten Log-Einträge (RAM-Verlauf) in °C
+    trend = [from_raw(history.trend(i)) for i in range(3)]
     status = []
     rom_family = []
     rom_serial = []
+    rom_id = []
     
     for i, t in enumerate(temps):
         label = labels[i]
@@ -356,12 +515,15 @@ def build_temps_payload():
         status.append(st)
         
         # ROM-Info hinzufügen
-        if i < len(rom_info_global) and rom_info_global[i]:
-            rom_family.append(rom_info_global[i].get("family", "--"))
-            rom_serial.append(rom_info_global[i].get("serial", "--"))
+        info = rom_info_global[i] if i < len(rom_info_global) else None
+        if info:
+            rom_family.append(info.family_id)
+            rom_serial.append(info.serial)
+            rom_id.append(info.rom_str)
         else:
             rom_family.append("--")
             rom_serial.append("--")
+            rom_id.append("--")
     
     return {
         "temps": temps,
@@ -369,104 +531,390 @@ def build_temps_payload():
         "labels": labels,
         "rom_family": rom_family,
         "rom_serial": rom_serial,
+        "rom_id": rom_id,
+        "seq": seq,
+        "timestamp": ts,
+        "trend": trend,
     }
 
-def handle_client(conn, addr):
+def _int_param(params, key, default):
     try:
-        conn.settimeout(2)
-        request = conn.recv(1024).decode() 
-        if not request:
-            conn.close()
-            return
+        return int(params[key]) if key in params else default
+    except ValueError:
+        return default
+
+def build_rrd_payload(params):
+    """Langzeit-Archiv für /api/rrd?from=<ts>&to=<ts> (Sekunden wie time.time()).
+    Ohne from: letzte 24 h. Das Archiv wählt rrd.query() passend zum Zeitraum."""
+    now = int(time.time())
+    t_to = _int_param(params, "to", now)
+    t_from = _int_param(params, "from", t_to - 86400)
+    step, rows = rrd.query(t_from, t_to)
+    out = []
+    for ts, sensors in rows:
+        out.append([ts] + [None if s is None else [from_raw(v) for v in s] for s in sensors])
+    return {
+        "step": step,
+        "from": t_from,
+        "to": t_to,
+        "labels": ["A", "B", "C"],
+        "fields": ["min", "max", "avg"],
+        "rows": out,
+    }
+
+def build_history_payload(params):
+    """Verlauf für Diagramme: /api/history?points=N&from=<ts>&to=<ts>
+    Je Sensor höchstens N Punkte [ts, °C] (Min/Max je Zeit-Bucket)."""
+    points = max(2, min(_int_param(params, "points", 200), 1000))
+    t_from = _int_param(params, "from", None)
+    t_to = _int_param(params, "to", None)
+    series = logger.downsample(t_from, t_to, points)
+    return {
+        "points": points,
+        "from": t_from,
+        "to": t_to,
+        "labels": ["A", "B", "C"],
+        "series": [[[ts, from_raw(r)] for ts, r in pts] for pts in series],
+    }
 
-        lines = request.split("\r\n")
-        first = lines[0].split()
-        if len(first) < 2:
-            conn.close()
+async def _send(writer, resp):
+    writer.write(resp.encode() if isinstance(resp, str) else resp)
+    await writer.drain()
+
+async def _respond(writer, status, body="", ctype="application/json", keep=False, extra=""):
+    """Komplette Antwort mit Content-Length (Voraussetzung für Keep-Alive)"""
+    if isinstance(body, str):
+        body = body.encode()
+    writer.write("HTTP/1.1 {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n{}{}\r\n".format(
+        status, ctype, len(body), extra, _connection(keep)).encode())
+    if body:
+        writer.write(body)
+    await writer.drain()
+
+def _connection(keep):
+    if keep:
+        return "Connection: keep-alive\r\nKeep-Alive: timeout={}\r\n".format(IDLE_TIMEOUT_S)
+    return "Connection: close\r\n"
+
+async def _send_asset(writer, path, headers, keep):
+    """Statisches Asset mit ETag: 304 bei passendem If-None-Match, sonst
+    gzip direkt aus dem Flash (oder Klartext ohne gzip-Support)"""
+    etag, ctype, cache, gz, body = assets.get(path)
+    extra = 'ETag: "{}"\r\nCache-Control: {}\r\nVary: Accept-Encoding\r\n'.format(etag, cache)
+    if headers.get("if-none-match") in ('"%s"' % etag, 'W/"%s"' % etag):
+        await _send(writer, "HTTP/1.1 304 Not Modified\r\n" + extra + _connection(keep) + "\r\n")
+        return
+    if gz and "gzip" in headers.get("accept-encoding", ""):
+        try:
+            with open(gz, "rb") as f:
+                size = f.seek(0, 2)
+                f.seek(0)
+                await _send(writer, "HTTP/1.1 200 OK\r\nContent-Type: {}\r\nContent-Encoding: gzip\r\nContent-Length: {}\r\n{}{}\r\n".format(
+                    ctype, size, extra, _connection(keep)))
+                buf = bytearray(SEND_CHUNK)
+                mv = memoryview(buf)
+                while True:
+                    n = f.readinto(buf)
+                    if not n:
+                        break
+                    writer.write(mv[:n])
+                    await writer.drain()
             return
-        method = first[0]
-        path   = first[1]
-        
-        resp = None
-
-        if method == "GET":
-            if path == "/":
-                resp = "HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\nConnection: close\r\n\r\n" + html_template
-            elif path == "/api/config":
-                resp = "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n" + json.dumps(cfg_global)
-            elif path == "/api/temps":
-                data = build_temps_payload()
-                resp = "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n" + json.dumps(data)
-            elif path == "/api/log":
-                log_lines = logger.get_log_lines(100) 
+        except OSError as e:
+            print("Asset Fehler:", gz, e)
+    await _respond(writer, "200 OK", body, ctype, keep, extra)
+
+async def _send_csv(writer):
+    """CSV-Download als Chunked-Encoding aus dem Log streamen - ein fester
+    Puffer je Download statt der ganzen Datei als String"""
+    buf = bytearray(SEND_CHUNK)
+    mv = memoryview(buf)
+    for n in logger.csv_chunks(buf):
+        writer.write(b"%x\r\n" % n)
+        writer.write(mv[:n])
+        writer.write(b"\r\n")
+        await writer.drain()
+    await _send(writer, b"0\r\n\r\n")
+
+async def _send_event(writer, event, data):
+    writer.write("event: {}\ndata: {}\n\n".format(event, json.dumps(data)).encode())
+    await writer.drain()
+
+async def _cancel_on_eof(reader, task):
+    """Wartet, bis der Client trennt (er sendet nichts mehr - jede Rückkehr
+    von read heißt getrennt), und bricht dann task ab"""
+    try:
+        await reader.read(1)
+    except:
+        pass
+    task.cancel()
+
+async def _stream_events(writer, params):
+    """Event-Schleife von _stream() - läuft, bis sie abgebrochen wird"""
+    await _send(writer, "HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                        "Cache-Control: no-cache\r\nConnection: close\r\n\r\nretry: 5000\n\n")
+    rows = max(0, min(_int_param(params, "log", 20), history.stats()["size"]))
+    added = history.added() - rows
+    seq = None
+    init = True
+    while True:
+        snap = await get_snapshot_global(None)
+        if snap[0] != seq:
+            seq = snap[0]
+            await _send_event(writer, "temps", await build_temps_payload())
+        # Log-Zeilen kommen im selben Durchlauf des Mess-Tasks wie der Snapshot
+        n = min(history.added() - added, history.count())
+        if n > 0 or init:
+            lines = [logger.format_record(history.get(k)) for k in range(n - 1, -1, -1)]
+            await _send_event(writer, "log", {"log": lines, "init": init})
+            added = history.added()
+            init = False
+        if not await wait_snapshot_global(seq, STREAM_PING_S):
+            writer.write(b": ping\n\n")
+            await writer.drain()
+
+async def _stream(reader, writer, params, keep):
+    """SSE: /api/stream?log=N - sendet bei jedem neuen Snapshot ein 'temps'-Event
+    (Werte + Status) und die neuen Log-Zeilen als 'log'-Event. Zum Start
+    kommen der aktuelle Stand und die letzten N Log-Zeilen ("init": true).
+    Läuft, bis der Client trennt; der Slot wird sofort bei dessen EOF frei,
+    nicht erst beim nächsten Ping."""
+    global _streams
+    if _streams >= MAX_STREAMS or not wait_snapshot_global:
+        await _respond(writer, "503 Service Unavailable", "503", "text/plain", keep)
+        return
+    _streams += 1
+    events = asyncio.create_task(_stream_events(writer, params))
+    eof = asyncio.create_task(_cancel_on_eof(reader, events))
+    try:
+        await events
+    except asyncio.CancelledError:
+        if not eof.done():
+            raise           # nicht vom Client, sondern von außen abgebrochen
+    finally:
+        events.cancel()
+        eof.cancel()
+        _streams -= 1
+
+async def _close(writer):
+    try:
+        writer.close()
+        await writer.wait_closed()
+    except:
+        pass
+
+# -------------------------------------------------------
+# HTTP: inkrementeller Parser + Keep-Alive
+# -------------------------------------------------------
+
+class HttpError(Exception):
+    """Ungültiger Request - args[0] ist die Statuszeile der Fehlerantwort"""
+
+def _remaining_s(deadline):
+    """Restzeit bis deadline (ticks_ms) in s; abgelaufen -> TimeoutError"""
+    ms = time.ticks_diff(deadline, time.ticks_ms())
+    if ms <= 0:
+        raise asyncio.TimeoutError()
+    return ms / 1000
+
+async def _read_more(reader, buf, timeout):
+    data = await asyncio.wait_for(reader.read(READ_CHUNK), timeout)
+    if not data:
+        raise OSError("Verbindung geschlossen")
+    return buf + data
+
+async def read_request(reader, buf):
+    """Liest einen Request inkrementell (auch über mehrere TCP-Segmente).
+    buf: bereits empfangene Bytes, z.B. ein gepipelineter Folge-Request.
+    Liefert ((method, target, headers, body, keep), rest) bzw. (None, b"")
+    bei Idle-Timeout oder wenn der Client die Verbindung schließt.
+    Header (MAX_HEADER) und Body (MAX_BODY) sind begrenzt -> HttpError.
+    Ab dem ersten Byte gilt eine Frist von REQUEST_TIMEOUT_S für den ganzen
+    Request - ein Client, der Byte für Byte tröpfelt, hält keinen Slot offen."""
+    deadline = time.ticks_add(time.ticks_ms(), REQUEST_TIMEOUT_S * 1000) if buf else None
+    # Request-Zeile + Header bis zur Leerzeile
+    while True:
+        end = buf.find(b"\r\n\r\n")
+        if end >= 0:
+            break
+        if len(buf) >= MAX_HEADER:
+            raise HttpError("431 Request Header Fields Too Large")
+        try:
+            buf = await _read_more(reader, buf, IDLE_TIMEOUT_S if deadline is None else _remaining_s(deadline))
+        except (OSError, asyncio.TimeoutError):
+            if buf:
+                raise
+            return None, b""   # Keep-Alive beendet
+        if deadline is None:
+            deadline = time.ticks_add(time.ticks_ms(), REQUEST_TIMEOUT_S * 1000)
+    if end > MAX_HEADER:
+        raise HttpError("431 Request Header Fields Too Large")
+
+    lines = buf[:end].decode().split("\r\n")
+    buf = buf[end + 4:]
+    first = lines[0].split()
+    if len(first) != 3 or not first[2].startswith("HTTP/1."):
+        raise HttpError("400 Bad Request")
+    method, target, version = first
+    headers = {}
+    for line in lines[1:]:
+        if ":" not in line:
+            raise HttpError("400 Bad Request")
+        k, v = line.split(":", 1)
+        headers[k.strip().lower()] = v.strip()
+
+    # Body genau nach Content-Length
+    if "transfer-encoding" in headers:
+        raise HttpError("501 Not Implemented")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError("400 Bad Request")
+    if length < 0:
+        raise HttpError("400 Bad Request")
+    if length > MAX_BODY:
+        raise HttpError("413 Payload Too Large")
+    while len(buf) < length:
+        buf = await _read_more(reader, buf, _remaining_s(deadline))
+    body = buf[:length]
+    buf = buf[length:]
+
+    conn = headers.get("connection", "").lower()
+    keep = conn != "close" if version == "HTTP/1.1" else conn == "keep-alive"
+    return (method, target, headers, body, keep), buf
+
+async def handle_client(reader, writer):
+    """Eine Verbindung (eigene Coroutine je Client - mehrere Browser gleichzeitig).
+    Mit Keep-Alive laufen mehrere Requests über dieselbe Verbindung."""
+    buf = b""
+    try:
+        for n in range(MAX_KEEPALIVE_REQUESTS):
+            try:
+                req, buf = await read_request(reader, buf)
+            except HttpError as e:
+                await _respond(writer, e.args[0], e.args[0], "text/plain")
+                break
+            if req is None:
+                break
+            method, target, headers, body, keep = req
+            keep = keep and n < MAX_KEEPALIVE_REQUESTS - 1
+            await handle_request(reader, writer, method, target, headers, body, keep)
+            if not keep:
+                break
+    except (OSError, asyncio.TimeoutError):
+        pass
+    except Exception as e:
+        print("Webserver Error:", e)
+    await _close(writer)
+
+async def handle_request(reader, writer, method, target, headers, body, keep):
+    path, params = parse_query(target)
+
+    if method == "GET":
+        if path == "/" or path == "/app.js":
+            await _send_asset(writer, path, headers, keep)
+        elif path == "/api/config":
+            await _respond(writer, "200 OK", json.dumps(cfg_global), keep=keep)
+        elif path == "/api/temps":
+            try:
+                max_age = float(params["max_age"]) if "max_age" in params else None
+            except ValueError:
+                max_age = None
+            data = await build_temps_payload(max_age)
+            await _respond(writer, "200 OK", json.dumps(data), keep=keep)
+        elif path == "/api/status":
+            data = get_stats_global() if get_stats_global else {}
+            data["log"] = logger.stats()
+            data["history"] = history.stats()
+            data["streams"] = _streams
+            try:
+                data["mem"] = {"free": gc.mem_free(), "alloc": gc.mem_alloc()}
+            except AttributeError:
+                data["mem"] = None   # nur unter MicroPython verfügbar
+            await _respond(writer, "200 OK", json.dumps(data), keep=keep)
+        elif path == "/api/log":
+            limit = max(1, min(_int_param(params, "limit", 100), 1000))
+            if "from" in params or "to" in params:
+                # Zeitfenster (Sekunden wie /api/temps "timestamp")
+                t_from = _int_param(params, "from", None)
+                t_to = _int_param(params, "to", None)
+                log_lines, total = logger.get_log_range(t_from, t_to, limit)
+                data = json.dumps({"log": log_lines, "from": t_from, "to": t_to, "total": total})
+            elif limit <= history.stats()["size"]:
+                # jüngste Einträge direkt aus dem RAM-Verlauf, ohne Flash-Zugriff
+                n = min(limit, history.count())
+                log_lines = [logger.format_record(history.get(k)) for k in range(n - 1, -1, -1)]
                 data = json.dumps({"log": log_lines})
-                resp = "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n" + data
-            elif path == "/api/log.csv":
-                csv_data = logger.get_log()
-                resp = "HTTP/1.1 200 OK\r\n"
-                resp += "Content-Type: text/csv\r\n"
-                resp += "Content-Disposition: attachment; filename=\"THERMO-LOGGER-Log.csv\"\r\n"
-                resp += "Connection: close\r\n"
-                resp += "\r\n"
-                resp += csv_data
-            else:
-                resp = "HTTP/1.1 404 Not Found\r\nConnection: close\r\n\r\n404"
-
-        elif method == "POST":
-            body = request.split("\r\n\r\n", 1)[1] if "\r\n\r\n" in request else ""
-            
-            if path == "/api/save":
-                try:
-                    new_cfg = json.loads(body)
-                    cfg_global.update(new_cfg)
-                    save_cb_global(cfg_global)
-                    resp = 'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n{"status":"ok"}'
-                except Exception as e:
-                    print("Config save error:", e)
-                    resp = 'HTTP/1.1 500 Internal Server Error\r\nConnection: close\r\n\r\n'
-                conn.send(resp)
-                conn.close()
-                time.sleep(2)
-                import machine
-                machine.reset()
-                return
-            elif path == "/api/clear":
-                logger.clear_log()
-                resp = 'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: close\r\n\r\n{"status":"cleared"}'
             else:
-                resp = "HTTP/1.1 404 Not Found\r\nConnection: close\r\n\r\n404"
+                log_lines = logger.get_log_lines(limit)
+                data = json.dumps({"log": log_lines})
+            await _respond(writer, "200 OK", data, keep=keep)
+        elif path == "/api/history":
+            data = build_history_payload(params)
+            await _respond(writer, "200 OK", json.dumps(data), keep=keep)
+        elif path == "/api/rrd":
+            data = build_rrd_payload(params)
+            await _respond(writer, "200 OK", json.dumps(data), keep=keep)
+        elif path == "/api/stream":
+            await _stream(reader, writer, params, keep)
+        elif path == "/api/log.csv":
+            resp = "HTTP/1.1 200 OK\r\n"
+            resp += "Content-Type: text/csv\r\n"
+            resp += "Content-Disposition: attachment; filename=\"THERMO-LOGGER-Log.csv\"\r\n"
+            resp += "Transfer-Encoding: chunked\r\n"
+            resp += _connection(keep)
+            resp += "\r\n"
+            await _send(writer, resp)
+            await _send_csv(writer)
         else:
-            resp = "HTTP/1.1 405 Method Not Allowed\r\nConnection: close\r\n\r\n405"
+            await _respond(writer, "404 Not Found", "404", "text/plain", keep)
+
+    elif method == "POST":
+        if path == "/api/save":
+            try:
+                new_cfg = json.loads(body.decode())
+                cfg_global.update(new_cfg)
+                save_cb_global(cfg_global)
+                await _respond(writer, "200 OK", '{"status":"ok"}')
+            except Exception as e:
+                print("Config save error:", e)
+                await _respond(writer, "500 Internal Server Error")
+            await _close(writer)
+            await asyncio.sleep(2)
+            logger.flush()   # gepufferte Log-Einträge (auch aus den 2 s) direkt vor dem Reset sichern
+            import machine
+            machine.reset()
+        elif path == "/api/clear":
+            logger.clear_log()
+            await _respond(writer, "200 OK", '{"status":"cleared"}', keep=keep)
+        else:
+            await _respond(writer, "404 Not Found", "404", "text/plain", keep)
+    else:
+        await _respond(writer, "405 Method Not Allowed", "405", "text/plain", keep)
+
+async def start_webserver(roms, cfg, save_cb, get_snapshot, rom_info=None, get_stats=None, wait_snapshot=None):
+    """Startet AP + Webserver im laufenden Eventloop - VERSION 1.5
+    get_snapshot/wait_snapshot sind Coroutinen (MeasurementService.get/.wait).
+    Gibt den Server zurück; die Verbindungen laufen als eigene Tasks neben
+    Messung und OLED."""
+    global cfg_global, get_snapshot_global, save_cb_global, rom_info_global, get_stats_global, wait_snapshot_global
 
-        if resp:
-            conn.sendall(resp)
-            conn.close()
-            
-    except OSError:
-        try:
-            conn.close()
-        except:
-            pass
-    except Exception as e:
-        print("Webserver Error:", e)
-        try:
-            conn.close()
-        except:
-            pass
-
-def start_webserver(roms, cfg, save_cb, get_temps, rom_info=None):
-    """Startet Webserver - VERSION 1.5"""
-    global cfg_global, get_temps_global, save_cb_global, rom_info_global
-    import machine
-    
     cfg_global = cfg
-    get_temps_global = get_temps
+    get_snapshot_global = get_snapshot
+    get_stats_global = get_stats
+    wait_snapshot_global = wait_snapshot
     save_cb_global = save_cb
     rom_info_global = rom_info or []
 
+    # Dashboard vorkomprimiert bereitstellen (komprimiert nur beim ersten Boot/Update)
+    assets.register([("/app.js", "application/javascript; charset=utf-8",
+                      "public, max-age=31536000, immutable", js_template)])
+    assets.register([("/", "text/html; charset=utf-8", "no-cache",
+                      html_template.replace("__APP_JS__", assets.etag("/app.js")))])
+
     ap = network.WLAN(network.AP_IF)
     ap.active(False)
-    time.sleep(0.5)
+    await asyncio.sleep(0.5)
     ap.active(True)
 
     ssid = cfg.get("ap_ssid", "TEMPLOGGER_Setup")
@@ -478,20 +926,6 @@ def start_webserver(roms, cfg, save_cb, get_temps, rom_info=None):
     print("WiFi AP started:", ssid)
     print("IP:", ap.ifconfig()[0])
 
-    addr = socket.getaddrinfo('0.0.0.0', 80)[0][-1]
-    sock = socket.socket()
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.bind(addr)
-    sock.listen(1)
-    sock.settimeout(10)
-
+    server = await asyncio.start_server(handle_client, "0.0.0.0", PORT)
     print("Webserver ready! Navigate to http://192.168.4.1")
-    while True:
-        try:
-            conn, addr = sock.accept()
-            handle_client(conn, addr)
-        except OSError:
-            pass
-        except Exception as e:
-            print("Socket Accept Error:", e)
-            time.sleep(1)
+    return server